@@ -1,18 +1,68 @@
-import google.generativeai as genai
+import json
 import logging
-from typing import Dict, Optional
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Optional, Union
+from classifier import AutomatedSenderClassifier
 from config import Config
+from metrics import metrics
+from prompt_compactor import PromptCompactor
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache
+from similarity_index import SimilarityIndex
+from thread_context import ThreadContextStore
 
 class AIResponder:
-    def __init__(self):
+    SENTIMENTS = ['positive', 'negative', 'neutral', 'urgent']
+    # Start of the draft string in a combined analysis, so it can be shown while the JSON streams in
+    DRAFT_FIELD = re.compile(r'"draft"\s*:\s*"')
+    
+    RESPONSE_RULES = """YANIT KURALLARI:
+1. Türkçe yanıt ver
+2. Dostça ve profesyonel bir ton kullan
+3. E-postanın içeriğine uygun cevap ver
+4. Kısa ve öz olsun (maksimum 200 kelime)
+5. Gerekirse sorular sor veya ek bilgi iste
+6. İmza ekleme, sadece e-posta içeriği oluştur
+7. Eğer e-posta bir soru içeriyorsa, mümkün olduğunca cevapla
+8. Eğer e-posta bir istek içeriyorsa, nasıl yardımcı olabileceğini belirt"""
+    
+    def __init__(self, model=None):
         self.logger = logging.getLogger(__name__)
-        self._configure_gemini()
+        self.usage = {}
+        self._usage_lock = threading.Lock()
+        self.latencies = deque(maxlen=1000)
+        self.rate_limiter = RateLimiter('Gemini', Config.GEMINI_REQUESTS_PER_MINUTE / 60, burst=1)
+        self.cache = ResponseCache() if Config.CACHE_ENABLED else None
+        self.similarity_index = SimilarityIndex() if Config.SIMILARITY_ENABLED else None
+        self.compactor = PromptCompactor() if Config.PROMPT_COMPACTION else None
+        self.thread_context = ThreadContextStore() if Config.THREAD_CONTEXT else None
+        # Mailboxes sharing this responder keep their approved replies and thread history apart
+        self.account_stores = {}
+        self.classifier = AutomatedSenderClassifier()
+        
+        # An injected model (e.g. fakes.FakeGenerativeModel) replaces the Gemini client
+        self._model = model
+        self._model_lock = threading.Lock()
+    
+    @property
+    def model(self):
+        """Gemini model, configured on first use so startup doesn't pay for importing the SDK"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._configure_gemini()
+        return self._model
         
     def _configure_gemini(self):
         """Configure Gemini AI"""
         try:
+            import google.generativeai as genai
+            
             genai.configure(api_key=Config.GEMINI_API_KEY)
-            self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
+            self._model = genai.GenerativeModel('gemini-2.0-flash-exp')
             self.logger.info("Gemini AI configured successfully")
         except Exception as e:
             self.logger.error(f"Failed to configure Gemini AI: {e}")
@@ -24,11 +74,18 @@ class AIResponder:
             # Create a detailed prompt for the AI
             prompt = self._create_prompt(email_data)
             
+            cached = self.cache.get('response', prompt) if self.cache else None
+            if cached is not None:
+                self.logger.info(f"Cached AI response used for email from {email_data['sender']}")
+                return cached
+            
             # Generate response using Gemini
-            response = self.model.generate_content(prompt)
+            response = self._generate(prompt, email_data.get('id'))
             
             if response.text:
                 self.logger.info(f"AI response generated for email from {email_data['sender']}")
+                if self.cache:
+                    self.cache.set('response', prompt, response.text.strip())
                 return response.text.strip()
             else:
                 self.logger.warning("Empty response from AI")
@@ -38,67 +95,510 @@ class AIResponder:
             self.logger.error(f"Error generating AI response: {e}")
             return None
     
-    def _create_prompt(self, email_data: Dict) -> str:
-        """Create a detailed prompt for AI response generation"""
+    def stream_response(self, email_data: Dict) -> Iterator[str]:
+        """Generate an AI response as a stream of text chunks; errors are raised to the caller"""
+        prompt = self._create_prompt(email_data)
         
-        sender = email_data.get('sender', 'Unknown')
-        subject = email_data.get('subject', 'No Subject')
+        cached = self.cache.get('response', prompt) if self.cache else None
+        if cached is not None:
+            self.logger.info(f"Cached AI response used for email from {email_data['sender']}")
+            yield cached
+            return
+        
+        start = time.perf_counter()
+        first_token = None
+        chunks = []
+        
+        response = self.rate_limiter.call(self.model.generate_content, prompt, stream=True)
+        for chunk in response:
+            if not chunk.parts:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            chunks.append(chunk.text)
+            yield chunk.text
+        
+        total = time.perf_counter() - start
+        self._record_latency(first_token if first_token is not None else total, total)
+        self._record_usage(email_data.get('id'), prompt, response, total)
+        
+        text = ''.join(chunks).strip()
+        if text:
+            self.logger.info(f"AI response streamed for email from {email_data['sender']} (first token after {first_token:.2f}s)")
+            if self.cache:
+                self.cache.set('response', prompt, text)
+    
+    def analyze_and_respond(self, email_data: Dict) -> Dict:
+        """Get sentiment, reply decision and draft from a single AI call"""
+        try:
+            prompt = self._create_combined_prompt(email_data)
+            
+            cached = self.cache.get('analysis', prompt) if self.cache else None
+            if cached is not None:
+                self.logger.info(f"Cached analysis used for email from {email_data['sender']}")
+                return json.loads(cached)
+            
+            response = self._generate(prompt, email_data.get('id'))
+            result = self._parse_combined_response(response.text)
+            
+        except Exception as e:
+            # The rate limiter already retried; more calls would only spend the budget again
+            self.logger.error(f"Error generating combined analysis: {e}")
+            return self.failed_analysis(e)
+        
+        return self._finish_analysis(email_data, prompt, result)
+    
+    def stream_analysis(self, email_data: Dict, on_text: Callable[[str], None]) -> Dict:
+        """Run the combined analysis as a stream, passing the draft text to on_text as it arrives"""
+        try:
+            prompt = self._create_combined_prompt(email_data)
+            
+            cached = self.cache.get('analysis', prompt) if self.cache else None
+            if cached is not None:
+                self.logger.info(f"Cached analysis used for email from {email_data['sender']}")
+                result = json.loads(cached)
+                if result['draft']:
+                    on_text(result['draft'])
+                return result
+            
+            start = time.perf_counter()
+            first_token = None
+            chunks = []
+            shown = 0
+            
+            response = self.rate_limiter.call(self.model.generate_content, prompt, stream=True)
+            for chunk in response:
+                if not chunk.parts:
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                chunks.append(chunk.text)
+                
+                draft = self._partial_draft(''.join(chunks))
+                if len(draft) > shown:
+                    on_text(draft[shown:])
+                    shown = len(draft)
+            
+            total = time.perf_counter() - start
+            self._record_latency(first_token if first_token is not None else total, total)
+            self._record_usage(email_data.get('id'), prompt, response, total)
+            result = self._parse_combined_response(''.join(chunks))
+            
+        except Exception as e:
+            self.logger.error(f"Error streaming combined analysis: {e}")
+            return self.failed_analysis(e)
+        
+        return self._finish_analysis(email_data, prompt, result)
+    
+    def _finish_analysis(self, email_data: Dict, prompt: str, result: Optional[Dict]) -> Dict:
+        """Cache a parsed combined analysis, or fall back to separate calls if it couldn't be parsed"""
+        if result:
+            self.logger.info(f"Combined analysis generated for email from {email_data['sender']}")
+            if self.cache and (result['draft'] or not result['should_reply']):
+                self.cache.set('analysis', prompt, json.dumps(result, ensure_ascii=False))
+            return result
+        
+        self.logger.warning("Could not parse combined analysis, falling back to separate calls")
+        return {
+            'sentiment': self.analyze_email_sentiment(email_data),
+            'should_reply': True,
+            'draft': self.generate_response(email_data),
+            'confidence': None
+        }
+    
+    def _partial_draft(self, text: str) -> str:
+        """Decode as much of the draft string as a partial combined analysis contains"""
+        match = self.DRAFT_FIELD.search(text)
+        if not match:
+            return ''
+        
+        raw = text[match.end():]
+        end = 0
+        while end < len(raw) and raw[end] != '"':
+            if raw[end] == '\\':
+                # Stop before an escape sequence that hasn't fully arrived
+                length = 6 if raw[end + 1:end + 2] == 'u' else 2
+                if end + length > len(raw):
+                    break
+                end += length
+            else:
+                end += 1
+        
+        try:
+            return json.loads(f'"{raw[:end]}"')
+        except ValueError:
+            return ''
+    
+    @staticmethod
+    def failed_analysis(error: Exception) -> Dict:
+        """Analysis result for an AI call that failed; the email is left for a later check"""
+        return {'sentiment': None, 'should_reply': True, 'draft': None, 'confidence': None, 'error': str(error)}
+    
+    def analyze_batch(self, emails: List[Dict]) -> Dict[str, Dict]:
+        """Analyze many emails, packing short ones into shared AI calls"""
+        results = {}
+        pending = []
+        
+        for email_data in emails:
+            prompt = self._create_combined_prompt(email_data)
+            cached = self.cache.get('analysis', prompt) if self.cache else None
+            if cached is not None:
+                results[email_data['id']] = json.loads(cached)
+            elif PromptCompactor.estimate_tokens(self._prompt_body(email_data)) <= Config.BATCH_MAX_EMAIL_TOKENS:
+                pending.append(email_data)
+        
+        # Fill batches up to the token budget and email limit
+        batches = []
+        batch, batch_tokens = [], 0
+        for email_data in pending:
+            tokens = PromptCompactor.estimate_tokens(self._format_email(email_data))
+            if batch and (batch_tokens + tokens > Config.BATCH_PROMPT_TOKENS or len(batch) >= Config.BATCH_MAX_EMAILS):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(email_data)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        
+        for batch in batches:
+            if len(batch) > 1:
+                results.update(self._analyze_batch_call(batch))
+        
+        # Long emails, single-email batches and anything the batch call missed
+        for email_data in emails:
+            if email_data['id'] not in results:
+                results[email_data['id']] = self.analyze_and_respond(email_data)
+        
+        return results
+    
+    def _analyze_batch_call(self, batch: List[Dict]) -> Dict[str, Dict]:
+        """Analyze a batch of emails with one AI call; emails missing from the output are left out"""
+        try:
+            response = self._generate(self._create_batch_prompt(batch), [email_data['id'] for email_data in batch])
+            data = self._load_json(response.text)
+        except Exception as e:
+            self.logger.error(f"Error generating batch analysis: {e}")
+            return {}
+        
+        if not isinstance(data, list):
+            self.logger.warning("Could not parse batch analysis, falling back to single calls")
+            return {}
+        
+        emails_by_id = {email_data['id']: email_data for email_data in batch}
+        results = {}
+        for item in data:
+            if not isinstance(item, dict) or str(item.get('id')) not in emails_by_id:
+                continue
+            
+            result = self._validate_analysis(item)
+            if result:
+                email_data = emails_by_id[str(item['id'])]
+                results[email_data['id']] = result
+                if self.cache and (result['draft'] or not result['should_reply']):
+                    self.cache.set('analysis', self._create_combined_prompt(email_data), json.dumps(result, ensure_ascii=False))
+        
+        self.logger.info(f"Batch analysis generated for {len(results)} of {len(batch)} emails")
+        return results
+    
+    def _load_json(self, text: str):
+        """Parse JSON from model output, or return None"""
+        text = text.strip()
+        
+        # Models often wrap JSON in a markdown code block
+        if text.startswith('```'):
+            text = text.strip('`')
+            if text.startswith('json'):
+                text = text[len('json'):]
+        
+        try:
+            return json.loads(text)
+        except ValueError:
+            return None
+    
+    def _parse_combined_response(self, text: str) -> Optional[Dict]:
+        """Parse and validate the JSON returned for a combined analysis"""
+        return self._validate_analysis(self._load_json(text))
+    
+    def _validate_analysis(self, data) -> Optional[Dict]:
+        """Validate and normalize one analysis object"""
+        if not isinstance(data, dict) or not isinstance(data.get('should_reply'), bool):
+            return None
+        
+        sentiment = str(data.get('sentiment', '')).strip().lower()
+        draft = data.get('draft')
+        
+        try:
+            confidence = min(max(float(data.get('confidence')), 0.0), 1.0)
+        except (TypeError, ValueError):
+            confidence = None
+        
+        return {
+            'sentiment': sentiment if sentiment in self.SENTIMENTS else 'neutral',
+            'should_reply': data['should_reply'],
+            'draft': draft.strip() if isinstance(draft, str) and draft.strip() else None,
+            'confidence': confidence
+        }
+    
+    def _generate(self, prompt: str, email_id: Union[str, List[str], None] = None):
+        """Call Gemini and record token and latency counters for the email"""
+        start = time.perf_counter()
+        response = self.rate_limiter.call(self.model.generate_content, prompt)
+        latency = time.perf_counter() - start
+        
+        # Without streaming the first token arrives with the rest of the response
+        self._record_latency(latency, latency)
+        self._record_usage(email_id, prompt, response, latency)
+        return response
+    
+    def _record_latency(self, first_token: float, total: float):
+        """Keep time-to-first-token and total latency of recent Gemini calls"""
+        with self._usage_lock:
+            self.latencies.append((first_token, total))
+    
+    def get_latency_stats(self) -> Optional[Dict]:
+        """Return latency percentiles over recent Gemini calls"""
+        with self._usage_lock:
+            samples = list(self.latencies)
+        
+        if not samples:
+            return None
+        
+        def percentile(values, fraction):
+            values = sorted(values)
+            return values[int(fraction * (len(values) - 1))]
+        
+        stats = {'count': len(samples)}
+        for name, values in (('first_token', [s[0] for s in samples]), ('total', [s[1] for s in samples])):
+            for fraction in (0.5, 0.9, 0.99):
+                stats[f"{name}_p{int(fraction * 100)}"] = percentile(values, fraction)
+        return stats
+    
+    def _record_usage(self, email_id: Union[str, List[str], None], prompt: str, response, latency: float):
+        """Add token and latency counters for a Gemini call"""
+        metadata = getattr(response, 'usage_metadata', None)
+        prompt_tokens = getattr(metadata, 'prompt_token_count', 0)
+        output_tokens = getattr(metadata, 'candidates_token_count', 0)
+        
+        # Older SDK versions don't report usage, so fall back to an estimate
+        if not prompt_tokens:
+            prompt_tokens = len(prompt) // 4
+        if not output_tokens:
+            try:
+                output_tokens = len(response.text) // 4
+            except ValueError:
+                output_tokens = 0
+        
+        # A batched call is shared evenly between its emails
+        email_ids = email_id if isinstance(email_id, list) else [email_id]
+        share = len(email_ids)
+        metrics.inc('gemini_tokens_total', prompt_tokens, kind='prompt')
+        metrics.inc('gemini_tokens_total', output_tokens, kind='output')
+        
+        with self._usage_lock:
+            for email_id in email_ids:
+                usage = self._get_usage(email_id)
+                usage['calls'] += 1
+                usage['prompt_tokens'] += prompt_tokens // share
+                usage['output_tokens'] += output_tokens // share
+                usage['latency'] += latency / share
+    
+    def _get_usage(self, email_id: Optional[str]) -> Dict:
+        """Return the usage counters of an email; callers hold the usage lock"""
+        return self.usage.setdefault(email_id, {
+            'calls': 0, 'prompt_tokens': 0, 'output_tokens': 0, 'latency': 0.0, 'tokens_saved': 0
+        })
+    
+    def _prompt_body(self, email_data: Dict) -> str:
+        """Return the email body to use in prompts, compacted once per email"""
         body = email_data.get('body', '')
+        if not self.compactor:
+            return body
+        
+        if 'prompt_body' not in email_data:
+            result = self.compactor.compact(body)
+            email_data['prompt_body'] = result['text']
+            with self._usage_lock:
+                self._get_usage(email_data.get('id'))['tokens_saved'] += result['tokens_saved']
+        
+        return email_data['prompt_body']
+    
+    def add_account(self, address: str, similarity_file: str = None, thread_context_file: str = None):
+        """Give a mailbox its own similarity index and thread context"""
+        self.account_stores[address.lower()] = (
+            SimilarityIndex(similarity_file) if Config.SIMILARITY_ENABLED else None,
+            ThreadContextStore(thread_context_file) if Config.THREAD_CONTEXT else None
+        )
+    
+    def _stores(self, email_data: Dict):
+        """Return the similarity index and thread context of the mailbox an email arrived in"""
+        account = (email_data.get('account') or '').lower()
+        return self.account_stores.get(account, (self.similarity_index, self.thread_context))
+    
+    def record_thread_messages(self, emails: List[Dict]):
+        """Add fetched emails to their thread context oldest-first, before any prompt is built"""
+        for email_data in sorted(emails, key=lambda email_data: email_data.get('received_at') or 0):
+            thread_id = email_data.get('thread_id')
+            thread_context = self._stores(email_data)[1]
+            if thread_context and thread_id:
+                thread_context.add_message(
+                    thread_id, email_data['id'], email_data.get('sender', ''), self._prompt_body(email_data),
+                    email_data.get('received_at')
+                )
+    
+    def _thread_summary(self, email_data: Dict) -> str:
+        """Return the summary of the messages that came before the email in its thread"""
+        thread_id = email_data.get('thread_id')
+        thread_context = self._stores(email_data)[1]
+        if not thread_context or not thread_id:
+            return ''
+        
+        if 'thread_summary' not in email_data:
+            email_data['thread_summary'] = thread_context.get_summary(
+                thread_id, email_data['id'], email_data.get('received_at')
+            )
+        
+        return email_data['thread_summary']
+    
+    def find_similar_response(self, email_data: Dict) -> Optional[Dict]:
+        """Find a previously approved response for a near-duplicate email"""
+        similarity_index = self._stores(email_data)[0]
+        if not similarity_index:
+            return None
+        
+        # Quoted history is shared by every reply in a thread, so only the new text is compared
+        match = similarity_index.find(self._prompt_body(email_data))
+        if match:
+            self.logger.info(f"Similar approved response found for email from {email_data['sender']} (score {match['score']:.2f})")
+        return match
+    
+    def remember_approved_response(self, email_data: Dict, response: str):
+        """Add an operator-approved response to the similarity index and thread context"""
+        similarity_index, thread_context = self._stores(email_data)
+        if similarity_index:
+            similarity_index.add(self._prompt_body(email_data), response)
+        
+        if thread_context and email_data.get('thread_id'):
+            thread_context.add_reply(email_data['thread_id'], response)
+    
+    def get_cache_stats(self) -> Optional[Dict]:
+        """Return response cache statistics, or None if caching is disabled"""
+        return self.cache.get_stats() if self.cache else None
+    
+    def pop_usage(self, email_id: str) -> Optional[Dict]:
+        """Return and clear the AI usage counters recorded for an email"""
+        with self._usage_lock:
+            return self.usage.pop(email_id, None)
+    
+    def _create_prompt(self, email_data: Dict) -> str:
+        """Create a detailed prompt for AI response generation"""
         
         prompt = f"""
 Sen bir profesyonel e-posta asistanısın. Aşağıdaki e-postaya uygun, dostça ve profesyonel bir yanıt oluştur.
 
-GELEN E-POSTA BİLGİLERİ:
-Gönderen: {sender}
-Konu: {subject}
-İçerik: {body}
+{self._format_email(email_data)}
 
-YANIT KURALLARI:
-1. Türkçe yanıt ver
-2. Dostça ve profesyonel bir ton kullan
-3. E-postanın içeriğine uygun cevap ver
-4. Kısa ve öz olsun (maksimum 200 kelime)
-5. Gerekirse sorular sor veya ek bilgi iste
-6. İmza ekleme, sadece e-posta içeriği oluştur
-7. Eğer e-posta bir soru içeriyorsa, mümkün olduğunca cevapla
-8. Eğer e-posta bir istek içeriyorsa, nasıl yardımcı olabileceğini belirt
+{self.RESPONSE_RULES}
 
 YANIT:
 """
         
         return prompt
     
+    def _create_combined_prompt(self, email_data: Dict) -> str:
+        """Create a prompt that asks for sentiment, reply decision and draft as JSON"""
+        
+        prompt = f"""
+Sen bir profesyonel e-posta asistanısın. Aşağıdaki e-postayı analiz et ve gerekiyorsa uygun, dostça ve profesyonel bir yanıt oluştur.
+
+{self._format_email(email_data)}
+
+{self.RESPONSE_RULES}
+
+ÇIKTI BİÇİMİ:
+Sadece aşağıdaki alanları içeren geçerli bir JSON nesnesi döndür, başka metin ekleme:
+{{"sentiment": "positive" | "negative" | "neutral" | "urgent", "should_reply": true | false, "draft": "yanıt metni veya null", "confidence": 0.0-1.0}}
+"confidence", taslağın insan kontrolü olmadan gönderilebileceğinden ne kadar emin olduğundur.
+"""
+        
+        return prompt
+    
+    def _create_batch_prompt(self, batch: List[Dict]) -> str:
+        """Create one prompt that asks for an analysis of every email in the batch"""
+        
+        emails = '\n\n'.join(
+            f"### E-POSTA id={email_data['id']}\n{self._format_email(email_data)}" for email_data in batch
+        )
+        
+        prompt = f"""
+Sen bir profesyonel e-posta asistanısın. Aşağıdaki e-postaların her birini ayrı ayrı analiz et ve gerekiyorsa her birine uygun, dostça ve profesyonel bir yanıt oluştur.
+
+{self.RESPONSE_RULES}
+
+{emails}
+
+ÇIKTI BİÇİMİ:
+Sadece her e-posta için bir nesne içeren geçerli bir JSON dizisi döndür, başka metin ekleme:
+[{{"id": "e-posta id", "sentiment": "positive" | "negative" | "neutral" | "urgent", "should_reply": true | false, "draft": "yanıt metni veya null", "confidence": 0.0-1.0}}]
+"confidence", taslağın insan kontrolü olmadan gönderilebileceğinden ne kadar emin olduğundur.
+"""
+        
+        return prompt
+    
+    def _format_email(self, email_data: Dict) -> str:
+        """Format the incoming email section of a prompt"""
+        sender = email_data.get('sender', 'Unknown')
+        subject = email_data.get('subject', 'No Subject')
+        body = self._prompt_body(email_data)
+        summary = self._thread_summary(email_data)
+        
+        section = f"""GELEN E-POSTA BİLGİLERİ:
+Gönderen: {sender}
+Konu: {subject}
+İçerik: {body}"""
+        
+        if summary:
+            section = f"""ÖNCEKİ YAZIŞMA ÖZETİ (eskiden yeniye):
+{summary}
+
+{section}"""
+        
+        return section
+    
     def should_respond(self, email_data: Dict) -> bool:
         """Determine if the email should receive an automated response"""
         
-        # Skip if it's from our own email
-        sender = email_data.get('sender', '').lower()
-        if Config.GMAIL_ADDRESS.lower() in sender:
-            return False
-        
-        # Skip common automated emails
-        subject = email_data.get('subject', '').lower()
-        automated_keywords = [
-            'noreply', 'no-reply', 'donotreply', 'automated',
-            'auto-reply', 'autoreply', 'notification',
-            'unsubscribe', 'bounce', 'delivery failure'
-        ]
-        
-        for keyword in automated_keywords:
-            if keyword in sender or keyword in subject:
+        with metrics.timed('should_respond', email_data.get('id')):
+            if not self.should_fetch_body(email_data):
+                return False
+            
+            # Skip if body is too short (likely spam or automated)
+            body = email_data.get('body', '').strip()
+            if len(body) < 10:
                 return False
+            
+            return True
+    
+    def should_fetch_body(self, email_data: Dict) -> bool:
+        """Decide from headers alone whether an email could need a response"""
+        return self.filter_batch([email_data])[0]
+    
+    def filter_batch(self, emails: List[Dict]) -> List[bool]:
+        """Decide from headers alone which emails of a batch could need a response"""
         
-        # Skip if body is too short (likely spam or automated)
-        body = email_data.get('body', '').strip()
-        if len(body) < 10:
-            return False
+        # Skip if it's from our own email
+        own = [
+            (email_data.get('account') or Config.GMAIL_ADDRESS).lower() in email_data.get('sender', '').lower()
+            for email_data in emails
+        ]
         
-        return True
+        # Skip automated emails, mailing lists and auto-generated mail
+        automated = self.classifier.classify_batch(emails)
+        return [not (is_own or is_automated) for is_own, is_automated in zip(own, automated)]
     
     def analyze_email_sentiment(self, email_data: Dict) -> str:
         """Analyze the sentiment of the email"""
         try:
-            body = email_data.get('body', '')
+            body = self._prompt_body(email_data)
             
             prompt = f"""
 Aşağıdaki e-postanın duygusal tonunu analiz et ve tek kelime ile yanıtla:
@@ -112,10 +612,17 @@ E-posta içeriği: {body}
 Yanıt (sadece tek kelime):
 """
             
-            response = self.model.generate_content(prompt)
+            use_cache = self.cache is not None and Config.CACHE_SENTIMENT
+            cached = self.cache.get('sentiment', prompt) if use_cache else None
+            if cached is not None:
+                return cached
+            
+            response = self._generate(prompt, email_data.get('id'))
             sentiment = response.text.strip().lower()
             
-            if sentiment in ['positive', 'negative', 'neutral', 'urgent']:
+            if sentiment in self.SENTIMENTS:
+                if use_cache:
+                    self.cache.set('sentiment', prompt, sentiment)
                 return sentiment
             else:
                 return 'neutral'
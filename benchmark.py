@@ -0,0 +1,475 @@
+import argparse
+import contextlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import Config
+
+# Offline benchmarks against the in-process fakes; no credentials or network needed
+BASE_CONFIG = {
+    'GMAIL_ADDRESS': 'benchmark@example.com',
+    'GEMINI_API_KEY': 'AIza-benchmark-key-0000000000',
+    'GMAIL_REQUESTS_PER_SECOND': 1e6,
+    'GEMINI_REQUESTS_PER_MINUTE': 1e9,
+    'RATE_LIMIT_DELAY': 0.01,
+    'APPROVAL_MODE': 'policy',
+    'STREAM_RESPONSES': False,
+    'INCREMENTAL_SYNC': True,
+}
+
+def configure(**overrides):
+    """Override Config values for a benchmark run"""
+    for name, value in overrides.items():
+        setattr(Config, name, value)
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[int(fraction * (len(values) - 1))]
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, where the platform reports it"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(rss / 1024 / (1024 if sys.platform == 'darwin' else 1), 1)
+
+@contextlib.contextmanager
+def workspace():
+    """Run inside a temporary directory so state files never touch the real ones"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as path:
+        os.chdir(path)
+        try:
+            yield path
+        finally:
+            os.chdir(cwd)
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the terminal output of the interactive system"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+def run_check(system):
+    """One iteration of EmailAISystem.run_continuous without the wait"""
+    system.process_emails()
+    system.gmail_client.flush_label_changes()
+    system.state_store.commit()
+
+def replay(messages: int = 10000, per_check: int = 500, workers: int = 3, gmail_latency: float = 0.002,
+           gemini_latency: float = 0.02, error_rate: float = 0.0, batch_generation: bool = False,
+           cache: bool = True, seed: int = 0) -> dict:
+    """Replay a synthetic inbox through EmailAISystem and measure throughput and latency"""
+    from ai_responder import AIResponder
+    from fakes import FakeGenerativeModel, FakeGmailService, generate_inbox
+    from gmail_client import GmailClient
+    from main import EmailAISystem
+    from policy import ReplyPolicy
+    
+    configure(
+        MAX_EMAILS_PER_CHECK=per_check, PIPELINE_WORKERS=workers, BATCH_GENERATION=batch_generation,
+        CACHE_ENABLED=cache, SIMILARITY_ENABLED=cache
+    )
+    inbox = generate_inbox(messages, seed)
+    service = FakeGmailService(latency=gmail_latency, error_rate=error_rate, seed=seed)
+    model = FakeGenerativeModel(latency=gemini_latency, error_rate=error_rate, seed=seed)
+    
+    with workspace(), quiet():
+        system = EmailAISystem(
+            {'gmail_address': service.email_address},
+            AIResponder(model=model),
+            GmailClient(service.email_address, service=service)
+        )
+        system.policy = ReplyPolicy(rules={'allowed_senders': ['*'], 'min_confidence': 0.7})
+        
+        # Latency of an email runs from the start of the check that fetched it until it is marked as read
+        fetched_at = {}
+        latencies = []
+        fetch_emails, acknowledge = system.fetch_emails, system.acknowledge
+        
+        def timed_fetch():
+            started = time.perf_counter()
+            emails = fetch_emails()
+            for email_data in emails:
+                fetched_at.setdefault(email_data['id'], started)
+            return emails
+        
+        def timed_acknowledge(email_data):
+            acknowledge(email_data)
+            started = fetched_at.pop(email_data['id'], None)
+            if started is not None:
+                latencies.append(time.perf_counter() - started)
+        
+        system.fetch_emails, system.acknowledge = timed_fetch, timed_acknowledge
+        
+        # The first check records the sync point, then the whole inbox arrives at once
+        run_check(system)
+        start = time.perf_counter()
+        for message in inbox:
+            service.deliver(message)
+        
+        checks = 0
+        while checks < messages // per_check + 5:
+            run_check(system)
+            checks += 1
+            if not system.gmail_client._load_sync_state().get('pending'):
+                break
+        
+        wall = time.perf_counter() - start
+        system.state_store.close()
+    
+    return {
+        'scenario': 'replay',
+        'messages': messages,
+        'workers': workers,
+        'batch_generation': batch_generation,
+        'checks': checks,
+        'wall_seconds': round(wall, 3),
+        'throughput_per_second': round(messages / wall, 1),
+        'latency_p50': round(percentile(latencies, 0.5), 4),
+        'latency_p99': round(percentile(latencies, 0.99), 4),
+        'sent': len(service.sent),
+        'drafts': len(service.drafts),
+        'gmail_round_trips': service.round_trips,
+        'gmail_calls': dict(service.calls),
+        'gmail_bytes': service.bytes_returned,
+        'gemini_calls': dict(model.calls),
+        'gemini_prompt_tokens': model.prompt_tokens,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+def push(messages: int = 10, interval: float = 0.5, check_interval: float = 2.0, seed: int = 0) -> list:
+    """Compare time-to-reply of push notifications and polling, running EmailAISystem.run_continuous"""
+    from ai_responder import AIResponder
+    from fakes import FakeGenerativeModel, FakeGmailService, generate_inbox
+    from gmail_client import GmailClient
+    from main import EmailAISystem
+    from policy import ReplyPolicy
+    from push_listener import LocalSubscriber, PushListener
+    
+    class StoppableSubscriber(LocalSubscriber):
+        # run_continuous only returns on Ctrl+C, so the benchmark ends it the same way
+        stopped = False
+        
+        def pull(self, timeout: float):
+            if self.stopped:
+                raise KeyboardInterrupt
+            return super().pull(timeout)
+    
+    configure(CHECK_INTERVAL=check_interval, MAX_EMAILS_PER_CHECK=messages, CACHE_ENABLED=False, SIMILARITY_ENABLED=False)
+    inbox = generate_inbox(messages, seed, automated_ratio=0)
+    results = []
+    
+    # Polling is the same loop with a subscriber that never receives a notification
+    for mode in ('polling', 'push'):
+        service = FakeGmailService(seed=seed)
+        subscriber = StoppableSubscriber()
+        
+        with workspace(), quiet():
+            system = EmailAISystem(
+                {'gmail_address': service.email_address},
+                AIResponder(model=FakeGenerativeModel(seed=seed)),
+                GmailClient(service.email_address, service=service)
+            )
+            system.policy = ReplyPolicy(rules={'allowed_senders': ['*'], 'min_confidence': 0.7})
+            listener = PushListener(subscriber, system.gmail_client, 'projects/benchmark/topics/gmail')
+            
+            # Time-to-reply runs from delivery until the reply is sent or saved as a draft and the email marked as read
+            delivered_at = {}
+            latencies = []
+            done = threading.Event()
+            acknowledge = system.acknowledge
+            
+            def timed_acknowledge(email_data):
+                acknowledge(email_data)
+                latencies.append(time.perf_counter() - delivered_at[email_data['id']])
+                if len(latencies) == messages:
+                    done.set()
+            
+            system.acknowledge = timed_acknowledge
+            
+            def deliver():
+                for message in inbox:
+                    time.sleep(interval)
+                    delivered_at[message['id']] = time.perf_counter()
+                    service.deliver(message)
+                    if mode == 'push':
+                        subscriber.publish(service.email_address, str(service.history_id))
+                
+                done.wait(check_interval * 2 + interval * messages)
+                subscriber.stopped = True
+                # Wake a pull that is waiting out the check interval
+                subscriber.publish(service.email_address, str(service.history_id))
+            
+            deliverer = threading.Thread(target=deliver, daemon=True)
+            deliverer.start()
+            system.run_continuous(listener)
+            deliverer.join()
+        
+        results.append({
+            'scenario': 'push',
+            'mode': mode,
+            'messages': messages,
+            'check_interval': check_interval,
+            'replied': len(latencies),
+            'time_to_reply_p50': round(percentile(latencies, 0.5), 3),
+            'time_to_reply_p99': round(percentile(latencies, 0.99), 3),
+            'history_calls': service.calls['history.list'],
+        })
+    return results
+
+def fetch(sizes=(5, 50, 500), latency: float = 0.01, seed: int = 0) -> list:
+    """Compare round trips and wall time of one-by-one and batched message fetching"""
+    from fakes import FakeGmailService, generate_inbox
+    from gmail_client import GmailClient
+    
+    results = []
+    for size in sizes:
+        inbox = generate_inbox(size, seed, automated_ratio=0)
+        for batch_fetch in (False, True):
+            configure(BATCH_FETCH=batch_fetch)
+            service = FakeGmailService(inbox, latency=latency, seed=seed)
+            client = GmailClient(service.email_address, service=service)
+            
+            start = time.perf_counter()
+            emails = client._fetch_emails(list(service.messages))
+            results.append({
+                'scenario': 'fetch',
+                'messages': size,
+                'batch_fetch': batch_fetch,
+                'fetched': len(emails),
+                'round_trips': service.round_trips,
+                'wall_seconds': round(time.perf_counter() - start, 3),
+            })
+    return results
+
+def prefilter(messages: int = 1000, automated_ratio: float = 0.3, seed: int = 0) -> list:
+    """Compare downloaded bytes with and without the header prefilter"""
+    from ai_responder import AIResponder
+    from fakes import FakeGenerativeModel, FakeGmailService, generate_inbox
+    from gmail_client import GmailClient
+    
+    configure(BATCH_FETCH=True)
+    inbox = generate_inbox(messages, seed, automated_ratio=automated_ratio)
+    results = []
+    
+    with workspace():
+        responder = AIResponder(model=FakeGenerativeModel())
+        for check in (None, responder.filter_batch):
+            service = FakeGmailService(inbox, seed=seed)
+            client = GmailClient(service.email_address, service=service)
+            
+            start = time.perf_counter()
+            emails = client._fetch_emails(list(service.messages), prefilter=check)
+            results.append({
+                'scenario': 'prefilter',
+                'messages': messages,
+                'prefilter': check is not None,
+                'fetched': len(emails),
+                'bytes': service.bytes_returned,
+                'round_trips': service.round_trips,
+                'wall_seconds': round(time.perf_counter() - start, 3),
+            })
+    return results
+
+def classifier(messages: int = 50000, folds: int = 5, path: str = None) -> list:
+    """Precision and recall on the labeled fixture, and classification throughput"""
+    from classifier import AutomatedSenderClassifier, HashedLogisticModel, evaluate, load_labeled
+    
+    path = path or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests', 'fixtures', 'automated_senders.jsonl')
+    emails, labels = load_labeled(path)
+    rules = AutomatedSenderClassifier(rules={}, model=None)
+    results = [{'scenario': 'classifier', 'model': False, 'emails': len(emails), **evaluate(rules.classify_batch(emails), labels)}]
+    
+    # Cross-validated so the model is never scored on emails it was trained on
+    predicted = [False] * len(emails)
+    for fold in range(folds):
+        train = [index for index in range(len(emails)) if index % folds != fold]
+        held_out = [index for index in range(len(emails)) if index % folds == fold]
+        model = HashedLogisticModel().fit([emails[index] for index in train], [labels[index] for index in train])
+        guesses = AutomatedSenderClassifier(rules={}, model=model).classify_batch([emails[index] for index in held_out])
+        for index, guess in zip(held_out, guesses):
+            predicted[index] = guess
+    
+    results.append({'scenario': 'classifier', 'model': True, 'emails': len(emails), **evaluate(predicted, labels)})
+    
+    corpus = (emails * (messages // len(emails) + 1))[:messages]
+    with_model = AutomatedSenderClassifier(rules={}, model=HashedLogisticModel().fit(emails, labels))
+    for check in (rules, with_model):
+        start = time.perf_counter()
+        check.classify_batch(corpus)
+        elapsed = time.perf_counter() - start
+        results.append({
+            'scenario': 'classifier',
+            'model': check.model is not None,
+            'messages': messages,
+            'messages_per_second': round(messages / elapsed),
+        })
+    return results
+
+def pipeline(messages: int = 200, workers: int = 4, gemini_latency: float = 0.1, seed: int = 0) -> list:
+    """Compare sequential and pipelined processing with slow Gemini calls"""
+    return [
+        replay(messages, per_check=messages, workers=count, gemini_latency=gemini_latency, cache=False, seed=seed)
+        for count in (1, workers)
+    ]
+
+def mime(messages: int = 2000, seed: int = 0) -> dict:
+    """Time body extraction over a corpus with an equal share of every MIME layout"""
+    from fakes import MIME_LAYOUTS, FakeGmailService, generate_inbox
+    from gmail_client import GmailClient
+    
+    corpus = generate_inbox(messages, seed, automated_ratio=0, layouts=[(name, 1) for name, _ in MIME_LAYOUTS])
+    client = GmailClient(service=FakeGmailService())
+    
+    start = time.perf_counter()
+    empty = sum(1 for message in corpus if not client._extract_email_body(message['payload']))
+    wall = time.perf_counter() - start
+    
+    return {
+        'scenario': 'mime',
+        'messages': messages,
+        'empty_bodies': empty,
+        'wall_seconds': round(wall, 3),
+        'messages_per_second': round(messages / wall, 1),
+    }
+
+def startup(runs: int = 5) -> dict:
+    """Time module imports and Gmail service construction in fresh interpreters"""
+    repo = os.path.dirname(os.path.abspath(__file__))
+    snippets = {
+        'import_main': "import main",
+        'build_gmail_service': (
+            "from google.auth.credentials import AnonymousCredentials\n"
+            "from googleapiclient.discovery import build\n"
+            "build('gmail', 'v1', credentials=AnonymousCredentials(), static_discovery=True, cache_discovery=False)"
+        ),
+    }
+    
+    result = {'scenario': 'startup', 'runs': runs}
+    for name, snippet in snippets.items():
+        code = f"import time\nstart = time.perf_counter()\n{snippet}\nprint(time.perf_counter() - start)"
+        timings = [
+            float(subprocess.run([sys.executable, '-c', code], cwd=repo, capture_output=True, text=True, check=True).stdout)
+            for _ in range(runs)
+        ]
+        result[f"{name}_ms"] = round(percentile(timings, 0.5) * 1000, 1)
+    return result
+
+def connections(requests: int = 200) -> list:
+    """Count connections opened for a run of requests with and without the shared keep-alive pool"""
+    import httplib2
+    from gmail_client import _shared_http
+    
+    opened = []
+    
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out in separate writes; don't let Nagle delay the body
+        disable_nagle_algorithm = True
+        
+        def setup(self):
+            super().setup()
+            opened.append(1)
+        
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'{}')
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    
+    results = []
+    for pooled in (False, True):
+        opened.clear()
+        start = time.perf_counter()
+        for _ in range(requests):
+            http = _shared_http() if pooled else httplib2.Http()
+            http.request(url)
+        results.append({
+            'scenario': 'connections',
+            'requests': requests,
+            'pooled': pooled,
+            'connections': len(opened),
+            'wall_seconds': round(time.perf_counter() - start, 3),
+        })
+    
+    server.shutdown()
+    server.server_close()
+    return results
+
+def print_results(results):
+    for result in results if isinstance(results, list) else [results]:
+        print('  '.join(f"{key}={value}" for key, value in result.items()))
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks with fake Gmail and Gemini backends')
+    parser.add_argument('scenario', choices=['replay', 'fetch', 'prefilter', 'pipeline', 'push', 'mime', 'startup', 'connections', 'classifier', 'all'])
+    parser.add_argument('--messages', type=int, help='Number of synthetic messages')
+    parser.add_argument('--per-check', type=int, default=500, help='MAX_EMAILS_PER_CHECK for replay')
+    parser.add_argument('--workers', type=int, default=3, help='PIPELINE_WORKERS for replay and pipeline')
+    parser.add_argument('--gmail-latency', type=float, default=0.002, help='Seconds per Gmail round trip')
+    parser.add_argument('--gemini-latency', type=float, default=0.02, help='Seconds per Gemini call')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of calls failing with a retryable error')
+    parser.add_argument('--batch-generation', action='store_true', help='Draft short emails with batched Gemini calls')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the response cache and similarity index')
+    parser.add_argument('--sizes', default='5,50,500', help='Inbox sizes for the fetch scenario')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON, e.g. for CI')
+    args = parser.parse_args()
+    
+    # Expected failures from injected errors would drown the results
+    logging.basicConfig(level=logging.CRITICAL, handlers=[logging.StreamHandler(sys.stderr)])
+    configure(**BASE_CONFIG)
+    
+    results = {}
+    if args.scenario in ('replay', 'all'):
+        results['replay'] = replay(
+            args.messages or (10000 if args.scenario == 'replay' else 1000), args.per_check, args.workers,
+            args.gmail_latency, args.gemini_latency, args.error_rate, args.batch_generation,
+            not args.no_cache, args.seed
+        )
+    if args.scenario in ('fetch', 'all'):
+        results['fetch'] = fetch([int(size) for size in args.sizes.split(',')], seed=args.seed)
+    if args.scenario in ('prefilter', 'all'):
+        results['prefilter'] = prefilter(args.messages or 1000, seed=args.seed)
+    if args.scenario in ('pipeline', 'all'):
+        results['pipeline'] = pipeline(args.messages or 200, max(args.workers, 2), seed=args.seed)
+    if args.scenario in ('push', 'all'):
+        results['push'] = push(args.messages or 10, seed=args.seed)
+    if args.scenario in ('mime', 'all'):
+        results['mime'] = mime(args.messages or 2000, seed=args.seed)
+    if args.scenario in ('startup', 'all'):
+        results['startup'] = startup()
+    if args.scenario in ('connections', 'all'):
+        results['connections'] = connections(args.messages or 200)
+    if args.scenario in ('classifier', 'all'):
+        results['classifier'] = classifier(args.messages or 50000)
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, result in results.items():
+            print(f"[{name}]")
+            print_results(result)
+
+if __name__ == "__main__":
+    main()
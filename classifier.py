@@ -0,0 +1,195 @@
+import json
+import logging
+import re
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from config import Config
+
+class HashedLogisticModel:
+    # Header tokens are hashed into a fixed number of weights, so no vocabulary is stored
+    DIMENSIONS = 1 << 16
+    TOKEN_PATTERN = re.compile(r'[a-z0-9_]+(?:-[a-z0-9_]+)*')
+    
+    def __init__(self, weights: np.ndarray = None, bias: float = 0.0):
+        self.weights = weights if weights is not None else np.zeros(self.DIMENSIONS, dtype=np.float64)
+        self.bias = bias
+    
+    @classmethod
+    def features(cls, email_data: Dict) -> List[int]:
+        """Hash the sender, subject and header names of an email into feature indices"""
+        headers = email_data.get('headers', {})
+        tokens = [f"s:{token}" for token in cls.TOKEN_PATTERN.findall(email_data.get('sender', '').lower())]
+        tokens += [f"j:{token}" for token in cls.TOKEN_PATTERN.findall(email_data.get('subject', '').lower())]
+        tokens += [f"h:{name}" for name in headers]
+        tokens += [f"p:{headers.get('precedence', '').strip().lower()}", f"a:{headers.get('auto-submitted', 'no').strip().lower()}"]
+        return sorted({zlib.crc32(token.encode('utf-8')) % cls.DIMENSIONS for token in tokens})
+    
+    @classmethod
+    def vectorize(cls, emails: List[Dict]):
+        """Return row and column indices of the sparse feature matrix of a batch"""
+        indices = [cls.features(email_data) for email_data in emails]
+        rows = np.repeat(np.arange(len(emails)), [len(row) for row in indices])
+        cols = np.fromiter((index for row in indices for index in row), dtype=np.int64, count=len(rows))
+        return rows, cols
+    
+    def score(self, emails: List[Dict]) -> np.ndarray:
+        """Probability that each email of the batch is automated"""
+        if not emails:
+            return np.zeros(0)
+        
+        rows, cols = self.vectorize(emails)
+        logits = np.bincount(rows, weights=self.weights[cols], minlength=len(emails)) + self.bias
+        return 1.0 / (1.0 + np.exp(-logits))
+    
+    def fit(self, emails: List[Dict], labels: List[bool], epochs: int = 300, learning_rate: float = 0.5, l2: float = 1e-4):
+        """Train with full-batch gradient descent on the sparse features"""
+        rows, cols = self.vectorize(emails)
+        targets = np.asarray(labels, dtype=np.float64)
+        count = len(emails)
+        
+        for _ in range(epochs):
+            logits = np.bincount(rows, weights=self.weights[cols], minlength=count) + self.bias
+            errors = 1.0 / (1.0 + np.exp(-logits)) - targets
+            gradient = np.bincount(cols, weights=errors[rows], minlength=self.DIMENSIONS) / count
+            self.weights -= learning_rate * (gradient + l2 * self.weights)
+            self.bias -= learning_rate * errors.mean()
+        return self
+    
+    def save(self, path: str):
+        with open(path, 'wb') as model_file:
+            np.savez_compressed(model_file, weights=self.weights, bias=np.array([self.bias]))
+    
+    @classmethod
+    def load(cls, path: str) -> 'HashedLogisticModel':
+        with np.load(path) as data:
+            return cls(data['weights'], float(data['bias'][0]))
+
+class AutomatedSenderClassifier:
+    # Rule sets matched without looking at the body; a rules file can extend every list
+    DEFAULT_RULES = {
+        # Substrings of the sender or subject
+        'keywords': [
+            'noreply', 'no-reply', 'donotreply', 'automated',
+            'auto-reply', 'autoreply', 'notification',
+            'unsubscribe', 'bounce', 'delivery failure'
+        ],
+        # Headers whose presence marks list or bulk mail (RFC 2369)
+        'list_headers': ['list-unsubscribe'],
+        # Precedence values of bulk and auto-generated mail
+        'precedence': ['bulk', 'list', 'junk', 'auto_reply'],
+    }
+    
+    def __init__(self, rules: Dict = None, model: Optional[HashedLogisticModel] = None, threshold: float = None):
+        self.logger = logging.getLogger(__name__)
+        self.rules = {name: list(values) for name, values in self.DEFAULT_RULES.items()}
+        for name, values in (rules if rules is not None else self.load_rules(Config.CLASSIFIER_RULES_FILE)).items():
+            if name not in self.rules:
+                raise ValueError(f"Unknown classifier rule set: {name}")
+            self.rules[name] += [value for value in values if value not in self.rules[name]]
+        
+        # All keywords in one alternation, so each email is scanned once instead of once per keyword
+        keywords = sorted(self.rules['keywords'], key=len, reverse=True)
+        self.keyword_pattern = re.compile('|'.join(re.escape(keyword) for keyword in keywords), re.IGNORECASE)
+        self.list_headers = frozenset(header.lower() for header in self.rules['list_headers'])
+        self.precedence = frozenset(value.lower() for value in self.rules['precedence'])
+        
+        self.model = model if model is not None else self.load_model(Config.CLASSIFIER_MODEL_FILE)
+        self.threshold = threshold if threshold is not None else Config.CLASSIFIER_THRESHOLD
+    
+    def load_rules(self, path: str) -> Dict:
+        """Load extra rules from a JSON file, if one is configured"""
+        if not path:
+            return {}
+        
+        with open(path) as rules_file:
+            return json.load(rules_file)
+    
+    def load_model(self, path: str) -> Optional[HashedLogisticModel]:
+        """Load a trained model, if one exists"""
+        if not path or not Path(path).exists():
+            return None
+        
+        self.logger.info(f"Automated sender model loaded from {path}")
+        return HashedLogisticModel.load(path)
+    
+    def matches_rules(self, email_data: Dict) -> bool:
+        """Check an email against the header rules"""
+        if self.keyword_pattern.search(f"{email_data.get('sender', '')}\n{email_data.get('subject', '')}"):
+            return True
+        
+        headers = email_data.get('headers', {})
+        if not self.list_headers.isdisjoint(headers):
+            return True
+        
+        # Auto-generated mail (RFC 3834)
+        if headers.get('auto-submitted', 'no').strip().lower() != 'no':
+            return True
+        
+        return headers.get('precedence', '').strip().lower() in self.precedence
+    
+    def classify_batch(self, emails: List[Dict]) -> List[bool]:
+        """Return whether each email is automated; the model scores all rule misses in one pass"""
+        automated = [self.matches_rules(email_data) for email_data in emails]
+        
+        if self.model is not None:
+            pending = [index for index, flagged in enumerate(automated) if not flagged]
+            scores = self.model.score([emails[index] for index in pending])
+            for index, score in zip(pending, scores):
+                automated[index] = bool(score >= self.threshold)
+                if automated[index]:
+                    # The model can be wrong where the rules aren't, so each skip can be audited in the log
+                    self.logger.info(
+                        f"Model flagged email {emails[index].get('id', '')} from {emails[index].get('sender', '')} "
+                        f"as automated (score {score:.2f})"
+                    )
+        
+        return automated
+    
+    def is_automated(self, email_data: Dict) -> bool:
+        return self.classify_batch([email_data])[0]
+
+def load_labeled(path: str):
+    """Load a JSON lines file of emails with an 'automated' label"""
+    emails, labels = [], []
+    with open(path, encoding='utf-8') as labeled_file:
+        for line in labeled_file:
+            if line.strip():
+                record = json.loads(line)
+                labels.append(bool(record.pop('automated')))
+                emails.append(record)
+    return emails, labels
+
+def evaluate(predicted: List[bool], labels: List[bool]) -> Dict:
+    """Precision and recall of predicted automated labels"""
+    true_positive = sum(1 for guess, label in zip(predicted, labels) if guess and label)
+    false_positive = sum(1 for guess, label in zip(predicted, labels) if guess and not label)
+    false_negative = sum(1 for guess, label in zip(predicted, labels) if not guess and label)
+    
+    return {
+        'precision': round(true_positive / max(1, true_positive + false_positive), 3),
+        'recall': round(true_positive / max(1, true_positive + false_negative), 3),
+        'false_positives': false_positive,
+        'false_negatives': false_negative,
+    }
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Train or evaluate the automated sender classifier')
+    parser.add_argument('command', choices=['train', 'evaluate'])
+    parser.add_argument('labeled', help='JSON lines file of emails with an "automated" label')
+    parser.add_argument('--model', default=Config.CLASSIFIER_MODEL_FILE, required=not Config.CLASSIFIER_MODEL_FILE)
+    args = parser.parse_args()
+    
+    emails, labels = load_labeled(args.labeled)
+    if args.command == 'train':
+        HashedLogisticModel().fit(emails, labels).save(args.model)
+        print(f"Model trained on {len(emails)} emails and saved to {args.model}")
+    else:
+        model = HashedLogisticModel.load(args.model) if Path(args.model).exists() else None
+        print(json.dumps({
+            'rules': evaluate(AutomatedSenderClassifier(model=None).classify_batch(emails), labels),
+            'rules_and_model': evaluate(AutomatedSenderClassifier(model=model).classify_batch(emails), labels) if model else None,
+        }, indent=2))
@@ -10,9 +10,28 @@ load_dotenv()
 class Config:
     # Gmail settings
     GMAIL_ADDRESS = os.getenv('GMAIL_ADDRESS')
+    ACCOUNTS_FILE = os.getenv('ACCOUNTS_FILE')  # Birden fazla hesap için JSON listesi
     
     # AI settings  
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+    COMBINED_ANALYSIS = os.getenv('COMBINED_ANALYSIS', 'true').lower() == 'true'  # Tek çağrıda duygu + yanıt
+    STREAM_RESPONSES = os.getenv('STREAM_RESPONSES', 'false').lower() == 'true'
+    PROMPT_COMPACTION = os.getenv('PROMPT_COMPACTION', 'true').lower() == 'true'  # Alıntı, imza ve yasal metinleri çıkar
+    PROMPT_BODY_TOKENS = int(os.getenv('PROMPT_BODY_TOKENS', 1500))
+    THREAD_CONTEXT = os.getenv('THREAD_CONTEXT', 'true').lower() == 'true'  # Yazışma geçmişi özetini prompt'a ekle
+    THREAD_CONTEXT_TOKENS = int(os.getenv('THREAD_CONTEXT_TOKENS', 600))
+    BATCH_GENERATION = os.getenv('BATCH_GENERATION', 'false').lower() == 'true'  # Kısa e-postaları tek çağrıda yanıtla
+    BATCH_PROMPT_TOKENS = int(os.getenv('BATCH_PROMPT_TOKENS', 4000))
+    BATCH_MAX_EMAIL_TOKENS = int(os.getenv('BATCH_MAX_EMAIL_TOKENS', 500))
+    BATCH_MAX_EMAILS = int(os.getenv('BATCH_MAX_EMAILS', 10))
+    
+    # Cache settings
+    CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'true').lower() == 'true'
+    CACHE_SENTIMENT = os.getenv('CACHE_SENTIMENT', 'false').lower() == 'true'
+    CACHE_TTL = int(os.getenv('CACHE_TTL', 7 * 24 * 3600))  # 1 hafta varsayılan
+    CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', 50 * 1024 * 1024))
+    SIMILARITY_ENABLED = os.getenv('SIMILARITY_ENABLED', 'true').lower() == 'true'
+    SIMILARITY_THRESHOLD = float(os.getenv('SIMILARITY_THRESHOLD', 0.8))
     
     # Application settings
     CHECK_INTERVAL = int(os.getenv('CHECK_INTERVAL', 300))  # 5 dakika varsayılan
@@ -21,16 +40,58 @@ class Config:
     
     # Security settings
     MAX_RESPONSE_ATTEMPTS = int(os.getenv('MAX_RESPONSE_ATTEMPTS', 3))
-    RATE_LIMIT_DELAY = int(os.getenv('RATE_LIMIT_DELAY', 2))
+    RATE_LIMIT_DELAY = int(os.getenv('RATE_LIMIT_DELAY', 2))  # Yeniden deneme için temel bekleme (saniye)
+    GMAIL_REQUESTS_PER_SECOND = float(os.getenv('GMAIL_REQUESTS_PER_SECOND', 20))
+    GEMINI_REQUESTS_PER_MINUTE = float(os.getenv('GEMINI_REQUESTS_PER_MINUTE', 10))
+    
+    # Fetch settings
+    BATCH_FETCH = os.getenv('BATCH_FETCH', 'true').lower() == 'true'
+    BATCH_SIZE = min(int(os.getenv('BATCH_SIZE', 50)), 100)  # Gmail allows at most 100 calls per batch
+    INCREMENTAL_SYNC = os.getenv('INCREMENTAL_SYNC', 'true').lower() == 'true'
+    PREFILTER_HEADERS = os.getenv('PREFILTER_HEADERS', 'true').lower() == 'true'  # Önce sadece başlıkları indir
+    MAX_BODY_BYTES = int(os.getenv('MAX_BODY_BYTES', 100 * 1024))  # Daha uzun gövdeler kesilir
+    BUFFER_LABEL_CHANGES = os.getenv('BUFFER_LABEL_CHANGES', 'true').lower() == 'true'
+    LABEL_FLUSH_SIZE = min(int(os.getenv('LABEL_FLUSH_SIZE', 1000)), 1000)  # batchModify limit
+    
+    # Classifier settings
+    CLASSIFIER_RULES_FILE = os.getenv('CLASSIFIER_RULES_FILE', '')  # Ek anahtar kelime/başlık kuralları (JSON)
+    CLASSIFIER_MODEL_FILE = os.getenv('CLASSIFIER_MODEL_FILE', '')  # Eğitilmiş model (isteğe bağlı), boşsa sadece kurallar
+    CLASSIFIER_THRESHOLD = float(os.getenv('CLASSIFIER_THRESHOLD', 0.5))
+    
+    # Push notification settings (Gmail watch + Pub/Sub)
+    PUBSUB_TOPIC = os.getenv('PUBSUB_TOPIC')  # projects/<proje>/topics/<konu>
+    PUBSUB_SUBSCRIPTION = os.getenv('PUBSUB_SUBSCRIPTION')  # projects/<proje>/subscriptions/<abonelik>
+    
+    # Pipeline settings
+    PIPELINE_WORKERS = int(os.getenv('PIPELINE_WORKERS', 3))  # Paralel taslak üretimi
+    SEND_WORKERS = int(os.getenv('SEND_WORKERS', 2))
+    STATE_COMMIT_EVERY = int(os.getenv('STATE_COMMIT_EVERY', 50))  # Durum kayıtları kaç yazmada bir diske işlenir
+    
+    # Approval settings
+    APPROVAL_MODE = os.getenv('APPROVAL_MODE', 'interactive').lower()  # interactive veya policy
+    POLICY_FILE = os.getenv('POLICY_FILE', 'policy.json')
+    
+    # Metrics settings
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+    METRICS_PORT = int(os.getenv('METRICS_PORT', 9108))  # http://127.0.0.1:<port>/metrics
+    TRACE_FILE = os.getenv('TRACE_FILE', '')  # Her e-posta için aşama süreleri (JSON lines)
     
     # Gmail API settings
     SCOPES = [
         'https://www.googleapis.com/auth/gmail.readonly',
-        'https://www.googleapis.com/auth/gmail.send'
+        'https://www.googleapis.com/auth/gmail.send',
+        'https://www.googleapis.com/auth/gmail.modify'
     ]
+    if PUBSUB_SUBSCRIPTION:
+        SCOPES.append('https://www.googleapis.com/auth/pubsub')
     
     CREDENTIALS_FILE = 'credentials/credentials.json'
     TOKEN_FILE = 'token.json'
+    HISTORY_FILE = 'history.json'
+    CACHE_FILE = 'response_cache.db'
+    SIMILARITY_FILE = 'similarity_index.db'
+    STATE_FILE = 'state.db'
+    THREAD_CONTEXT_FILE = 'thread_context.db'
     
     @classmethod
     def validate(cls):
@@ -43,6 +104,12 @@ class Config:
         missing = []
         invalid = []
         
+        # Addresses come from the accounts file in multi-account mode
+        if cls.ACCOUNTS_FILE:
+            del required_vars['GMAIL_ADDRESS']
+            if not Path(cls.ACCOUNTS_FILE).exists():
+                missing.append(f"Accounts file: {cls.ACCOUNTS_FILE}")
+        
         for var, value in required_vars.items():
             if not value:
                 missing.append(var)
@@ -51,6 +118,9 @@ class Config:
             elif var == 'GEMINI_API_KEY' and (len(value) < 20 or not value.startswith('AIza')):
                 invalid.append(f"{var}: Invalid API key format")
         
+        if cls.APPROVAL_MODE not in ('interactive', 'policy'):
+            invalid.append("APPROVAL_MODE: Must be 'interactive' or 'policy'")
+        
         # Check file existence
         if not Path(cls.CREDENTIALS_FILE).exists():
             missing.append(f"Credentials file: {cls.CREDENTIALS_FILE}")
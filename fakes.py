@@ -0,0 +1,508 @@
+import base64
+import json
+import random
+import re
+import threading
+import time
+from bisect import bisect_right
+from collections import Counter
+from email.mime.application import MIMEApplication
+from email.mime.message import MIMEMessage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Callable, Dict, List, Optional
+import httplib2
+from googleapiclient.errors import HttpError
+
+# In-process stand-ins for the Gmail API and Gemini, used by benchmark.py to run without network access
+
+SENTENCES = [
+    "Merhaba, geçen hafta gönderdiğim teklif hakkında bilgi almak istiyorum.",
+    "Toplantıyı perşembe saat 14:00'e alabilir miyiz?",
+    "Faturadaki tutar siparişle uyuşmuyor, kontrol edebilir misiniz?",
+    "Ekte istediğiniz raporu bulabilirsiniz.",
+    "Could you send me the updated contract by Friday?",
+    "Thanks for the quick reply, that solves our problem.",
+    "Siparişim hâlâ kargoya verilmedi, ne zaman gönderilecek?",
+    "Proje planında birkaç değişiklik yapmamız gerekiyor.",
+    "We would like to schedule a demo for our team next week.",
+    "Şifremi sıfırlayamıyorum, yardımcı olabilir misiniz?",
+]
+
+AUTOMATED_SENDERS = [
+    "noreply@shop.example.com", "no-reply@news.example.com",
+    "notifications@service.example.com", "mailer-daemon@mail.example.com",
+]
+
+PEOPLE = [
+    "Ayşe Yılmaz <ayse@musteri.example.com>", "Mehmet Demir <mehmet@tedarikci.example.com>",
+    "John Smith <john@partner.example.com>", "Elif Kaya <elif@firma.example.com>",
+    "Can Öztürk <can@ajans.example.com>", "Maria Garcia <maria@client.example.com>",
+]
+
+# internalDate of the first generated message, in milliseconds
+INBOX_START_MS = 1700000000000
+
+# Relative frequency of MIME layouts seen in a typical inbox
+MIME_LAYOUTS = [('plain', 40), ('alternative', 30), ('html', 10), ('mixed', 10), ('nested', 5), ('legacy', 3), ('forwarded', 2)]
+
+class FakeGeminiError(Exception):
+    def __init__(self, code: int):
+        super().__init__(f"Fake Gemini error {code}")
+        self.code = code
+
+def _encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode()
+
+def message_to_payload(message) -> Dict:
+    """Convert an email.message tree into a Gmail API payload"""
+    payload = {
+        'mimeType': message.get_content_type(),
+        'filename': message.get_filename() or '',
+        'headers': [{'name': name, 'value': str(value)} for name, value in message.items()],
+    }
+    
+    if message.is_multipart():
+        payload['body'] = {'size': 0}
+        payload['parts'] = [message_to_payload(part) for part in message.get_payload()]
+    elif payload['filename']:
+        # Gmail never inlines attachment data in messages.get
+        payload['body'] = {'attachmentId': 'attachment', 'size': len(message.get_payload(decode=True))}
+    else:
+        data = message.get_payload(decode=True)
+        payload['body'] = {'size': len(data), 'data': _encode(data)}
+    
+    return payload
+
+def build_body(rng: random.Random) -> str:
+    """Draw an email body from a short/medium/long size distribution"""
+    size = rng.choices(['short', 'medium', 'long'], weights=[50, 40, 10])[0]
+    count = {'short': 2, 'medium': 8, 'long': 40}[size]
+    body = ' '.join(rng.choice(SENTENCES) for _ in range(count))
+    
+    if size == 'long':
+        # Long emails are mostly quoted history
+        quoted = '\n'.join(f"> {rng.choice(SENTENCES)}" for _ in range(200))
+        body += f"\n\nOn Mon, 1 Jan 2024 at 10:00, Someone <someone@example.com> wrote:\n{quoted}"
+    
+    return body
+
+def build_mime(rng: random.Random, layout: str, sender: str, subject: str, body: str, automated: bool = False):
+    """Build an email.message in one of the MIME_LAYOUTS"""
+    html = f"<html><head><style>p {{margin: 0}}</style></head><body><p>{body}</p></body></html>"
+    
+    if layout == 'plain':
+        message = MIMEText(body, 'plain', 'utf-8')
+    elif layout == 'html':
+        message = MIMEText(html, 'html', 'utf-8')
+    elif layout == 'alternative':
+        message = MIMEMultipart('alternative')
+        message.attach(MIMEText(body, 'plain', 'utf-8'))
+        message.attach(MIMEText(html, 'html', 'utf-8'))
+    elif layout == 'legacy':
+        # Older Turkish mail clients still send single-byte charsets
+        message = MIMEMultipart('alternative')
+        message.attach(MIMEText(body, 'plain', 'iso-8859-9'))
+        message.attach(MIMEText(html, 'html', 'windows-1254'))
+    elif layout == 'forwarded':
+        # Forwarded as an attachment: the text lives inside a message/rfc822 part
+        original = MIMEText(body, 'plain', 'utf-8')
+        original['From'] = sender
+        original['Subject'] = subject
+        message = MIMEMultipart('mixed')
+        message.attach(MIMEMessage(original))
+    else:
+        alternative = MIMEMultipart('alternative')
+        alternative.attach(MIMEText(body, 'plain', 'utf-8'))
+        alternative.attach(MIMEText(html, 'html', 'utf-8'))
+        
+        if layout == 'nested':
+            related = MIMEMultipart('related')
+            related.attach(alternative)
+            related.attach(MIMEApplication(b'\x89PNG' + rng.randbytes(512), 'png', Name='logo.png'))
+            related.get_payload()[-1].add_header('Content-Disposition', 'inline', filename='logo.png')
+            alternative = related
+        
+        message = MIMEMultipart('mixed')
+        message.attach(alternative)
+        attachment = MIMEApplication(rng.randbytes(4096), 'pdf', Name='rapor.pdf')
+        attachment.add_header('Content-Disposition', 'attachment', filename='rapor.pdf')
+        message.attach(attachment)
+    
+    message['From'] = sender
+    message['Subject'] = subject
+    message['Date'] = 'Mon, 1 Jan 2024 10:00:00 +0300'
+    
+    if automated:
+        message['List-Unsubscribe'] = '<mailto:unsubscribe@example.com>'
+        message['Precedence'] = 'bulk'
+    
+    return message
+
+def generate_inbox(count: int, seed: int = 0, automated_ratio: float = 0.3, layouts: List = None) -> List[Dict]:
+    """Generate Gmail message resources for a synthetic inbox"""
+    rng = random.Random(seed)
+    layouts = layouts or MIME_LAYOUTS
+    names, weights = zip(*layouts)
+    messages = []
+    
+    for index in range(count):
+        automated = rng.random() < automated_ratio
+        sender = rng.choice(AUTOMATED_SENDERS) if automated else rng.choice(PEOPLE)
+        subject = rng.choice(['Kampanya', 'Bülten', 'Bildirim']) if automated else rng.choice(['Teklif', 'Toplantı', 'Fatura', 'Sipariş', 'Demo'])
+        layout = rng.choices(names, weights=weights)[0]
+        
+        mime = build_mime(rng, layout, sender, subject, build_body(rng), automated)
+        messages.append({
+            'id': f"msg{index:06d}",
+            # Roughly a third of the messages continue an earlier thread
+            'threadId': f"thread{rng.randrange(max(1, count * 2 // 3)):06d}",
+            # A minute apart, in the order the messages arrived
+            'internalDate': str(INBOX_START_MS + index * 60000),
+            'labelIds': ['INBOX', 'UNREAD'],
+            'payload': message_to_payload(mime),
+            'sizeEstimate': len(mime.as_bytes()),
+            'automated': automated,
+        })
+    
+    return messages
+
+class FakeRequest:
+    def __init__(self, service, method: str, handler: Callable, **kwargs):
+        self.service = service
+        self.method = method
+        self.handler = handler
+        self.kwargs = kwargs
+    
+    def execute(self):
+        """Run the request as one HTTP round trip"""
+        return self.service._round_trip(self.method, lambda: self.handler(**self.kwargs))
+
+class FakeBatchRequest:
+    # Gmail accepts at most 100 calls per batch
+    MAX_CALLS = 100
+    
+    def __init__(self, service, callback: Callable):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+    
+    def add(self, request: FakeRequest, request_id: str = None):
+        if len(self.requests) >= self.MAX_CALLS:
+            raise ValueError(f"Batch requests are limited to {self.MAX_CALLS} calls")
+        self.requests.append((request_id or str(len(self.requests)), request))
+    
+    def execute(self):
+        """Run all calls in one round trip; each call can fail on its own"""
+        def run():
+            results = []
+            for request_id, request in self.requests:
+                try:
+                    self.service._maybe_fail(request.method)
+                    results.append((request_id, self.service._call(request.method, request.handler, request.kwargs), None))
+                except HttpError as error:
+                    results.append((request_id, None, error))
+            return results
+        
+        for request_id, response, error in self.service._round_trip('batch', run):
+            self.callback(request_id, response, error)
+
+class _Resource:
+    # Mirrors a googleapiclient resource: methods build requests, children are nested resources
+    def __init__(self, service, prefix: str, methods: Dict[str, Callable], children: Dict[str, '_Resource'] = None):
+        self._service = service
+        self._prefix = prefix
+        self._methods = methods
+        self._children = children or {}
+    
+    def __getattr__(self, name):
+        if name in self._children:
+            return lambda: self._children[name]
+        
+        handler = self._methods.get(name)
+        if handler is None:
+            raise AttributeError(name)
+        
+        if name.endswith('_next'):
+            return handler
+        return lambda **kwargs: FakeRequest(self._service, f"{self._prefix}.{name}", handler, **kwargs)
+
+class FakeGmailService:
+    def __init__(self, messages: List[Dict] = None, email_address: str = 'benchmark@example.com',
+                 latency: float = 0.0, error_rate: float = 0.0, error_status: int = 503, seed: int = 0):
+        self.email_address = email_address
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        # Methods that fail on every call with the given status, e.g. {'messages.batchModify': 500}
+        self.failing = {}
+        self.random = random.Random(seed)
+        self.messages = {}
+        self.history = []
+        self.history_id = 1000
+        self.sent = []
+        self.drafts = []
+        self.calls = Counter()
+        self.round_trips = 0
+        self.bytes_returned = 0
+        self._lock = threading.Lock()
+        
+        self._users = _Resource(self, 'users', {'getProfile': self._getProfile, 'watch': self._watch}, {
+            'messages': _Resource(self, 'messages', {
+                'list': self._messages_list, 'get': self._messages_get, 'send': self._messages_send,
+                'modify': self._messages_modify, 'batchModify': self._messages_batchModify,
+                'list_next': self._list_next,
+            }),
+            'history': _Resource(self, 'history', {'list': self._history_list, 'list_next': self._list_next}),
+            'drafts': _Resource(self, 'drafts', {'create': self._drafts_create}),
+        })
+        
+        for message in messages or []:
+            self.deliver(message, record_history=False)
+    
+    def deliver(self, message: Dict, record_history: bool = True):
+        """Add a message to the inbox, like a new email arriving"""
+        with self._lock:
+            self.history_id += 1
+            self.messages[message['id']] = dict(message, labelIds=list(message['labelIds']), historyId=str(self.history_id))
+            if record_history:
+                self.history.append((self.history_id, message['id']))
+    
+    def _round_trip(self, method: str, run: Callable):
+        """Simulate network latency and transient errors around one HTTP request"""
+        with self._lock:
+            self.round_trips += 1
+            delay = self.latency * self.random.uniform(0.5, 1.5)
+        
+        if delay:
+            time.sleep(delay)
+        
+        # Calls inside a batch fail one by one, like real batch responses
+        if method == 'batch':
+            return run()
+        
+        self._maybe_fail(method)
+        return self._call(method, run, {})
+    
+    def _maybe_fail(self, method: str):
+        """Raise a transient error for the configured share of calls, or every call of a failing method"""
+        with self._lock:
+            status = self.failing.get(method)
+            if status is None and self.random.random() >= self.error_rate:
+                return
+            status = status or self.error_status
+            self.calls[method] += 1
+        raise self._error(status, 'backendError' if status != 429 else 'rateLimitExceeded')
+    
+    def _call(self, method: str, handler: Callable, kwargs: Dict):
+        with self._lock:
+            self.calls[method] += 1
+        
+        result = handler(**kwargs)
+        with self._lock:
+            self.bytes_returned += len(json.dumps(result))
+        return result
+    
+    def _error(self, status: int, reason: str):
+        return HttpError(httplib2.Response({'status': status}), json.dumps({'error': reason}).encode())
+    
+    def users(self):
+        return self._users
+    
+    def new_batch_http_request(self, callback: Callable = None):
+        return FakeBatchRequest(self, callback)
+    
+    def _getProfile(self, userId):
+        with self._lock:
+            return {'emailAddress': self.email_address, 'messagesTotal': len(self.messages), 'historyId': str(self.history_id)}
+    
+    def _watch(self, userId, body):
+        with self._lock:
+            return {'historyId': str(self.history_id), 'expiration': str(int((time.time() + 7 * 86400) * 1000))}
+    
+    def _messages_list(self, userId, q: str = None, maxResults: int = 100, pageToken: str = None, labelIds: List = None):
+        with self._lock:
+            ids = [
+                (message['id'], message['threadId']) for message in self.messages.values()
+                if (q != 'is:unread' or 'UNREAD' in message['labelIds'])
+                and all(label in message['labelIds'] for label in labelIds or [])
+            ]
+        
+        start = int(pageToken or 0)
+        page = ids[start:start + maxResults]
+        result = {'messages': [{'id': id, 'threadId': thread_id} for id, thread_id in page], 'resultSizeEstimate': len(ids)}
+        if start + maxResults < len(ids):
+            result['nextPageToken'] = str(start + maxResults)
+        return result
+    
+    def _messages_get(self, userId, id: str, format: str = 'full', metadataHeaders: List = None):
+        with self._lock:
+            message = self.messages.get(id)
+            if message is None:
+                raise self._error(404, 'notFound')
+            labels = list(message['labelIds'])
+        
+        resource = {'id': id, 'threadId': message['threadId'], 'labelIds': labels, 'historyId': message['historyId'],
+                    'internalDate': message.get('internalDate', '0'), 'sizeEstimate': message['sizeEstimate']}
+        
+        if format == 'metadata':
+            wanted = {name.lower() for name in metadataHeaders or []}
+            headers = [header for header in message['payload']['headers'] if not wanted or header['name'].lower() in wanted]
+            resource['payload'] = {'mimeType': message['payload']['mimeType'], 'headers': headers}
+        elif format == 'minimal':
+            pass
+        else:
+            resource['payload'] = message['payload']
+        return resource
+    
+    def _messages_send(self, userId, body: Dict):
+        with self._lock:
+            self.sent.append(body)
+            return {'id': f"sent{len(self.sent):06d}", 'labelIds': ['SENT']}
+    
+    def _apply_labels(self, message_id: str, add: List, remove: List):
+        message = self.messages.get(message_id)
+        if message is None:
+            return False
+        message['labelIds'] = [label for label in message['labelIds'] if label not in remove] + \
+            [label for label in add if label not in message['labelIds']]
+        return True
+    
+    def _messages_modify(self, userId, id: str, body: Dict):
+        with self._lock:
+            if not self._apply_labels(id, body.get('addLabelIds', []), body.get('removeLabelIds', [])):
+                raise self._error(404, 'notFound')
+            return {'id': id, 'labelIds': list(self.messages[id]['labelIds'])}
+    
+    def _messages_batchModify(self, userId, body: Dict):
+        if len(body['ids']) > 1000:
+            raise self._error(400, 'tooManyIds')
+        
+        with self._lock:
+            for message_id in body['ids']:
+                self._apply_labels(message_id, body.get('addLabelIds', []), body.get('removeLabelIds', []))
+        return {}
+    
+    def _history_list(self, userId, startHistoryId, historyTypes: List = None, labelId: str = None,
+                      pageToken: str = None, maxResults: int = 100):
+        with self._lock:
+            # History is kept in ascending order, so a page is a slice after the start point
+            start = int(pageToken or bisect_right(self.history, (int(startHistoryId), chr(0x10ffff))))
+            page = self.history[start:start + maxResults]
+            records = [
+                {'id': str(history_id), 'messagesAdded': [{'message': {
+                    'id': message_id,
+                    'threadId': self.messages[message_id]['threadId'],
+                    'labelIds': list(self.messages[message_id]['labelIds'])
+                }}]}
+                for history_id, message_id in page
+                if labelId is None or labelId in self.messages[message_id]['labelIds']
+            ]
+            result = {'history': records, 'historyId': str(self.history_id)}
+            if start + maxResults < len(self.history):
+                result['nextPageToken'] = str(start + maxResults)
+        return result
+    
+    def _list_next(self, previous_request: FakeRequest, previous_response: Dict) -> Optional[FakeRequest]:
+        token = previous_response.get('nextPageToken')
+        if not token:
+            return None
+        return FakeRequest(self, previous_request.method, previous_request.handler, **dict(previous_request.kwargs, pageToken=token))
+    
+    def _drafts_create(self, userId, body: Dict):
+        with self._lock:
+            self.drafts.append(body)
+            return {'id': f"draft{len(self.drafts):06d}", 'message': body['message']}
+
+class FakeResponse:
+    def __init__(self, text: str, prompt_tokens: int, output_tokens: int):
+        self.text = text
+        self.parts = [text] if text else []
+        self.usage_metadata = FakeUsage(prompt_tokens, output_tokens)
+
+class FakeUsage:
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+
+class FakeStream:
+    # Iterable like a streamed Gemini response, with usage known once it is consumed
+    def __init__(self, model, text: str, prompt_tokens: int, chunk_delay: float):
+        self.model = model
+        self.chunks = re.findall(r'\S+\s*', text)
+        self.text = text
+        self.chunk_delay = chunk_delay
+        self.usage_metadata = FakeUsage(prompt_tokens, len(text) // 4)
+    
+    def __iter__(self):
+        for chunk in self.chunks:
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            yield FakeResponse(chunk, 0, 0)
+
+class FakeGenerativeModel:
+    REPLIES = [
+        "Merhaba,\n\nE-postanız için teşekkür ederiz. Talebinizi inceledik ve en kısa sürede size dönüş yapacağız.",
+        "Merhaba,\n\nBelirttiğiniz konu ile ilgili ekibimiz çalışıyor. Ek bilgiye ihtiyaç olursa sizinle iletişime geçeceğiz.",
+        "Hello,\n\nThank you for your message. We will get back to you with the details shortly.",
+    ]
+    
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, error_code: int = 503,
+                 reply_rate: float = 0.9, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.reply_rate = reply_rate
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.prompt_tokens = 0
+        self._lock = threading.Lock()
+    
+    def _analysis(self) -> Dict:
+        """Draw one analysis result; callers hold the lock"""
+        should_reply = self.random.random() < self.reply_rate
+        return {
+            'sentiment': self.random.choice(['positive', 'neutral', 'neutral', 'negative', 'urgent']),
+            'should_reply': should_reply,
+            'draft': self.random.choice(self.REPLIES) if should_reply else None,
+            'confidence': round(self.random.uniform(0.5, 1.0), 2)
+        }
+    
+    def generate_content(self, prompt: str, stream: bool = False):
+        """Answer a prompt in the shape AIResponder expects for its kind"""
+        batch_ids = re.findall(r'^### E-POSTA id=(\S+)', prompt, re.MULTILINE)
+        if batch_ids:
+            kind = 'batch'
+        elif '"should_reply"' in prompt:
+            kind = 'combined'
+        elif 'tek kelime' in prompt:
+            kind = 'sentiment'
+        else:
+            kind = 'response'
+        
+        with self._lock:
+            self.calls[kind] += 1
+            self.prompt_tokens += len(prompt) // 4
+            delay = self.latency * self.random.uniform(0.5, 1.5)
+            fail = self.random.random() < self.error_rate
+            
+            if kind == 'batch':
+                text = json.dumps([dict(self._analysis(), id=email_id) for email_id in batch_ids], ensure_ascii=False)
+            elif kind == 'combined':
+                text = json.dumps(self._analysis(), ensure_ascii=False)
+            elif kind == 'sentiment':
+                text = self.random.choice(['positive', 'neutral', 'negative', 'urgent'])
+            else:
+                text = self.random.choice(self.REPLIES)
+        
+        if stream:
+            if fail:
+                raise FakeGeminiError(self.error_code)
+            chunks = max(1, len(text.split()))
+            return FakeStream(self, text, len(prompt) // 4, delay / chunks)
+        
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise FakeGeminiError(self.error_code)
+        return FakeResponse(text, len(prompt) // 4, len(text) // 4)
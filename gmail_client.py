@@ -2,30 +2,72 @@ import os
 import json
 import base64
 import email
-from typing import List, Dict, Optional
+from datetime import datetime, timedelta
+from typing import Callable, List, Dict, Optional
 import logging
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+import threading
+import httplib2
 from googleapiclient.errors import HttpError
+from email.message import Message
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from config import Config
+from metrics import metrics
+from rate_limiter import RateLimiter
+
+# Heavy Google client modules are imported where they are first needed, to keep startup fast
+
+# One keep-alive connection pool per thread, shared by every mailbox
+_transport = threading.local()
+
+def _shared_http() -> httplib2.Http:
+    """Return the calling thread's pooled HTTP connection, so TLS handshakes happen once per thread"""
+    http = getattr(_transport, 'http', None)
+    if http is None:
+        http = _transport.http = httplib2.Http()
+    return http
 
 class GmailClient:
-    def __init__(self):
-        self.service = None
+    # Headers needed to decide whether an email is worth downloading in full
+    METADATA_HEADERS = ['From', 'Subject', 'Date', 'List-Unsubscribe', 'Auto-Submitted', 'Precedence']
+    # Refresh access tokens this long before they expire rather than after a failed call
+    TOKEN_REFRESH_MARGIN = 300
+    
+    def __init__(self, gmail_address: str = None, token_file: str = None, history_file: str = None, service=None):
+        self._service = None
+        self._service_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.creds = None
+        self.gmail_address = gmail_address or Config.GMAIL_ADDRESS
+        self.token_file = token_file or Config.TOKEN_FILE
+        self.history_file = history_file or Config.HISTORY_FILE
         self.logger = logging.getLogger(__name__)
-        self._authenticate()
+        self._local = threading.local()
+        self.rate_limiter = RateLimiter('Gmail', Config.GMAIL_REQUESTS_PER_SECOND)
+        self._pending_labels = {}
+        self._labels_lock = threading.Lock()
+        # Guards the pending queue in the history file, which label flushes update from worker threads
+        self._sync_lock = threading.RLock()
+        self._marked_read = set()
+        # Called with message IDs once their UNREAD label has been removed in Gmail, not just queued
+        self.read_listeners = []
+        
+        # An injected service (e.g. fakes.FakeGmailService) skips OAuth entirely
+        if service is not None:
+            self._service = service
+        else:
+            self._authenticate()
     
     def _authenticate(self):
         """Authenticate with Gmail API"""
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        
         creds = None
         
         # Load existing token
-        if os.path.exists(Config.TOKEN_FILE):
-            creds = Credentials.from_authorized_user_file(Config.TOKEN_FILE, Config.SCOPES)
+        if os.path.exists(self.token_file):
+            creds = Credentials.from_authorized_user_file(self.token_file, Config.SCOPES)
         
         # If no valid credentials, get new ones
         if not creds or not creds.valid:
@@ -35,36 +77,86 @@ class GmailClient:
                 if not os.path.exists(Config.CREDENTIALS_FILE):
                     raise FileNotFoundError(f"Credentials file not found: {Config.CREDENTIALS_FILE}")
                 
+                from google_auth_oauthlib.flow import InstalledAppFlow
                 flow = InstalledAppFlow.from_client_secrets_file(
                     Config.CREDENTIALS_FILE, Config.SCOPES)
                 creds = flow.run_local_server(port=0)
             
             # Save credentials for next time
-            with open(Config.TOKEN_FILE, 'w') as token:
-                token.write(creds.to_json())
+            self._save_token(creds)
         
-        self.service = build('gmail', 'v1', credentials=creds)
-        self.logger.info("Gmail authentication successful")
+        self.creds = creds
+        self.logger.info(f"Gmail authentication successful for {self.gmail_address}")
+    
+    def _save_token(self, creds):
+        """Write credentials to the token file"""
+        with open(self.token_file, 'w') as token:
+            token.write(creds.to_json())
+    
+    @property
+    def service(self):
+        """Gmail API service, built on first use from the discovery document bundled with the client library"""
+        if self._service is None:
+            with self._service_lock:
+                if self._service is None:
+                    from googleapiclient.discovery import build
+                    self._service = build(
+                        'gmail', 'v1', credentials=self.creds, requestBuilder=self._build_request,
+                        static_discovery=True, cache_discovery=False
+                    )
+        return self._service
     
-    def get_unread_emails(self, max_results: int = None) -> List[Dict]:
+    def _build_request(self, http, *args, **kwargs):
+        """Build requests on the calling thread's transport, since httplib2 is not thread-safe"""
+        from googleapiclient.http import HttpRequest
+        
+        self._refresh_token_if_expiring()
+        return HttpRequest(self._get_http(), *args, **kwargs)
+    
+    def _refresh_token_if_expiring(self):
+        """Refresh the access token shortly before it expires, so calls never fail on an expired token"""
+        expiry = getattr(self.creds, 'expiry', None)
+        margin = timedelta(seconds=self.TOKEN_REFRESH_MARGIN)
+        if expiry is None or not self.creds.refresh_token or expiry - datetime.utcnow() > margin:
+            return
+        
+        with self._refresh_lock:
+            # Another thread may have refreshed while this one waited
+            if self.creds.expiry - datetime.utcnow() > margin:
+                return
+            
+            try:
+                from google.auth.transport.requests import Request
+                self.creds.refresh(Request())
+                self._save_token(self.creds)
+                self.logger.info("Gmail access token refreshed before expiry")
+            except Exception as error:
+                # The transport still refreshes on a 401, so a failed early refresh is not fatal
+                self.logger.warning(f"Could not refresh Gmail access token early: {error}")
+    
+    def _get_http(self):
+        """Return an authorized HTTP transport for the calling thread, on its shared connection pool"""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            from google_auth_httplib2 import AuthorizedHttp
+            http = AuthorizedHttp(self.creds, http=_shared_http())
+            self._local.http = http
+        return http
+    
+    def get_unread_emails(self, max_results: int = None, prefilter: Callable[[List[Dict]], List[bool]] = None) -> List[Dict]:
         """Get unread emails"""
         try:
             max_results = max_results or Config.MAX_EMAILS_PER_CHECK
             
             # Search for unread emails
-            results = self.service.users().messages().list(
+            results = self.rate_limiter.execute(self.service.users().messages().list(
                 userId='me',
                 q='is:unread',
                 maxResults=max_results
-            ).execute()
+            ))
             
             messages = results.get('messages', [])
-            emails = []
-            
-            for message in messages:
-                email_data = self._get_email_details(message['id'])
-                if email_data:
-                    emails.append(email_data)
+            emails = self._fetch_emails([message['id'] for message in messages], prefilter)
             
             self.logger.info(f"Found {len(emails)} unread emails")
             return emails
@@ -73,30 +165,314 @@ class GmailClient:
             self.logger.error(f"An error occurred while fetching emails: {error}")
             return []
     
+    def get_new_emails(self, max_results: int = None, prefilter: Callable[[List[Dict]], List[bool]] = None) -> List[Dict]:
+        """Get unread emails added since the last check using the Gmail history API"""
+        if not Config.INCREMENTAL_SYNC:
+            return self.get_unread_emails(max_results, prefilter)
+        
+        max_results = max_results or Config.MAX_EMAILS_PER_CHECK
+        with self._sync_lock:
+            # Emails marked as read from here on are dropped from the queue this check saves
+            self._marked_read.clear()
+            state = self._load_sync_state()
+        
+        if not state.get('history_id'):
+            return self._full_sync(max_results, prefilter)
+        
+        try:
+            new_ids = []
+            seen = set()
+            history_id = state['history_id']
+            
+            request = self.service.users().history().list(
+                userId='me',
+                startHistoryId=history_id,
+                historyTypes=['messageAdded'],
+                labelId='INBOX'
+            )
+            while request is not None:
+                response = self.rate_limiter.execute(request)
+                history_id = response.get('historyId', history_id)
+                
+                for record in response.get('history', []):
+                    for added in record.get('messagesAdded', []):
+                        message = added['message']
+                        if 'UNREAD' in message.get('labelIds', []) and message['id'] not in seen:
+                            seen.add(message['id'])
+                            new_ids.append(message['id'])
+                
+                request = self.service.users().history().list_next(request, response)
+            
+        except HttpError as error:
+            if error.resp.status == 404:
+                self.logger.warning("Stored history ID expired, performing full resync")
+                return self._full_sync(max_results, prefilter)
+            self.logger.error(f"An error occurred while syncing history: {error}")
+            return []
+        
+        # Newest mail first, like the is:unread listing, then the backlog of earlier checks
+        new_ids.reverse()
+        message_ids = new_ids + [message_id for message_id in state.get('pending', []) if message_id not in seen]
+        emails = self._fetch_pending(history_id, message_ids, max_results, prefilter)
+        
+        self.logger.info(f"Found {len(emails)} new unread emails")
+        return emails
+    
+    def _full_sync(self, max_results: int, prefilter: Callable[[List[Dict]], List[bool]] = None) -> List[Dict]:
+        """List all unread emails and record the current history ID as the sync point"""
+        try:
+            # Read the history ID first so nothing arriving during the listing is missed
+            profile = self.rate_limiter.execute(self.service.users().getProfile(userId='me'))
+        except HttpError as error:
+            self.logger.error(f"An error occurred while reading mailbox profile: {error}")
+            return []
+        
+        message_ids = self._list_unread_ids()
+        if message_ids is None:
+            # Keep the previous sync point so the next check retries the full sync
+            return []
+        
+        emails = self._fetch_pending(profile['historyId'], message_ids, max_results, prefilter)
+        
+        self.logger.info(f"Found {len(emails)} unread emails, {max(0, len(message_ids) - max_results)} left for later checks")
+        return emails
+    
+    def _fetch_pending(self, history_id: str, message_ids: List[str], max_results: int,
+                       prefilter: Callable[[List[Dict]], List[bool]] = None) -> List[Dict]:
+        """Save the new sync point with every pending ID, fetch the first ones and drop those that need no reply"""
+        # Saved before fetching, so a failed fetch or a crash can't lose an email
+        with self._sync_lock:
+            message_ids = [message_id for message_id in message_ids if message_id not in self._marked_read]
+            self._save_sync_state(history_id, message_ids)
+        
+        gone = []
+        emails = self._fetch_emails(message_ids[:max_results], prefilter, gone)
+        
+        # Pending IDs stay queued until they are marked as read, so failed fetches and skipped emails come back
+        done = set(gone) | {email_data['id'] for email_data in emails if 'UNREAD' not in email_data['labels']}
+        with self._sync_lock:
+            elsewhere = [message_id for message_id in message_ids if message_id in done and message_id not in self._marked_read]
+            done |= self._marked_read
+            self._save_sync_state(history_id, [message_id for message_id in message_ids if message_id not in done])
+        
+        # Emails read or deleted in another client are finished too, so listeners can close them out
+        if elsewhere:
+            self.logger.info(f"{len(elsewhere)} pending emails were read or deleted elsewhere")
+            for listener in self.read_listeners:
+                listener(elsewhere)
+        
+        return [email_data for email_data in emails if email_data['id'] not in done]
+    
+    def _list_unread_ids(self) -> Optional[List[str]]:
+        """List the IDs of all unread emails, or None if the listing failed"""
+        message_ids = []
+        try:
+            request = self.service.users().messages().list(userId='me', q='is:unread', maxResults=500)
+            while request is not None:
+                response = self.rate_limiter.execute(request)
+                message_ids.extend(message['id'] for message in response.get('messages', []))
+                request = self.service.users().messages().list_next(request, response)
+        except HttpError as error:
+            self.logger.error(f"An error occurred while listing unread emails: {error}")
+            return None
+        return message_ids
+    
+    def _load_sync_state(self) -> Dict:
+        """Load the last synced history ID and pending message IDs"""
+        if not os.path.exists(self.history_file):
+            return {}
+        
+        try:
+            with open(self.history_file) as history_file:
+                return json.load(history_file)
+        except (OSError, ValueError) as error:
+            self.logger.warning(f"Could not read sync state, performing full resync: {error}")
+            return {}
+    
+    def _save_sync_state(self, history_id: str, pending: List[str]):
+        """Persist the last synced history ID and pending message IDs"""
+        with open(self.history_file, 'w') as history_file:
+            json.dump({'history_id': history_id, 'pending': pending}, history_file)
+    
+    def requeue(self, message_ids: List[str]):
+        """Add emails to the end of the pending queue, so the next checks fetch them again"""
+        if not Config.INCREMENTAL_SYNC or not message_ids:
+            return
+        
+        with self._sync_lock:
+            state = self._load_sync_state()
+            # Without a sync point the next check lists every unread email anyway
+            if not state.get('history_id'):
+                return
+            
+            pending = state.get('pending', [])
+            queued = set(pending)
+            added = [message_id for message_id in message_ids if message_id not in queued]
+            if added:
+                self._save_sync_state(state['history_id'], pending + added)
+                self.logger.info(f"Requeued {len(added)} unfinished emails")
+    
+    def defer(self, message_ids: List[str]):
+        """Move emails to the end of the pending queue, so the emails behind them get fetched"""
+        if not Config.INCREMENTAL_SYNC or not message_ids:
+            return
+        
+        with self._sync_lock:
+            state = self._load_sync_state()
+            if not state.get('history_id'):
+                return
+            
+            deferred = set(message_ids)
+            pending = [message_id for message_id in state.get('pending', []) if message_id not in deferred]
+            pending += [message_id for message_id in message_ids if message_id not in self._marked_read]
+            self._save_sync_state(state['history_id'], pending)
+    
+    def _notify_read(self, message_ids: List[str]):
+        """Drop emails marked as read from the pending queue and tell the read listeners"""
+        self._forget_pending(message_ids)
+        for listener in self.read_listeners:
+            listener(message_ids)
+    
+    def _forget_pending(self, message_ids: List[str]):
+        """Drop emails that were marked as read from the pending queue"""
+        if not Config.INCREMENTAL_SYNC:
+            return
+        
+        with self._sync_lock:
+            self._marked_read.update(message_ids)
+            state = self._load_sync_state()
+            if not state.get('history_id'):
+                return
+            
+            done = set(message_ids)
+            pending = state.get('pending', [])
+            if any(message_id in done for message_id in pending):
+                self._save_sync_state(state['history_id'], [message_id for message_id in pending if message_id not in done])
+    
+    def _fetch_emails(self, message_ids: List[str], prefilter: Callable[[List[Dict]], List[bool]] = None,
+                      gone: List[str] = None) -> List[Dict]:
+        """Get details for a list of message IDs, downloading bodies only for emails passing the prefilter"""
+        if prefilter:
+            # Phase one: headers only, so automated mail never has its body downloaded
+            with metrics.timed('fetch_metadata'):
+                candidates = self._get_messages(message_ids, gone, format='metadata', metadataHeaders=self.METADATA_HEADERS)
+            parsed = [self._parse_message(message, include_body=False) for message in candidates]
+            parsed = [email_data for email_data in parsed if email_data]
+            message_ids = []
+            skipped = 0
+            
+            # The whole page is classified in one call
+            for email_data, wanted in zip(parsed, prefilter(parsed)):
+                if wanted:
+                    message_ids.append(email_data['id'])
+                else:
+                    self.mark_as_read(email_data['id'])
+                    skipped += 1
+            
+            if skipped:
+                self.logger.info(f"Skipped {skipped} automated emails based on headers")
+        
+        with metrics.timed('fetch_details'):
+            messages = self._get_messages(message_ids, gone, format='full')
+        
+        emails = []
+        for message in messages:
+            email_data = self._parse_message(message)
+            if email_data:
+                emails.append(email_data)
+        return emails
+    
+    def _get_messages(self, message_ids: List[str], gone: List[str] = None, **params) -> List[Dict]:
+        """Get Gmail message resources, batching requests when enabled; deleted IDs are added to gone"""
+        if Config.BATCH_FETCH and len(message_ids) > 1:
+            return self._batch_get_messages(message_ids, gone, **params)
+        
+        messages = [self._get_message(message_id, gone, **params) for message_id in message_ids]
+        return [message for message in messages if message]
+    
+    def _batch_get_messages(self, message_ids: List[str], gone: List[str] = None, **params) -> List[Dict]:
+        """Get many Gmail message resources using batch requests"""
+        messages = {}
+        retry_ids = []
+        
+        def on_response(request_id, response, exception):
+            if exception is None:
+                messages[request_id] = response
+            elif RateLimiter.get_status(exception) in RateLimiter.RETRYABLE_STATUSES:
+                retry_ids.append(request_id)
+            elif RateLimiter.get_status(exception) == 404 and gone is not None:
+                gone.append(request_id)
+            else:
+                self.logger.error(f"An error occurred while fetching email {request_id}: {exception}")
+        
+        for start in range(0, len(message_ids), Config.BATCH_SIZE):
+            chunk = message_ids[start:start + Config.BATCH_SIZE]
+            batch = self.service.new_batch_http_request(callback=on_response)
+            for message_id in chunk:
+                batch.add(
+                    self.service.users().messages().get(userId='me', id=message_id, **params),
+                    request_id=message_id
+                )
+            
+            try:
+                self.rate_limiter.execute(batch, cost=len(chunk))
+            except HttpError as error:
+                self.logger.error(f"An error occurred while executing batch request: {error}")
+        
+        # Throttled items are retried one by one under the rate limiter
+        for message_id in retry_ids:
+            message = self._get_message(message_id, gone, **params)
+            if message:
+                messages[message_id] = message
+        
+        # Keep the order returned by the list call
+        return [messages[message_id] for message_id in message_ids if message_id in messages]
+    
     def _get_email_details(self, message_id: str) -> Optional[Dict]:
         """Get detailed information about an email"""
+        message = self._get_message(message_id)
+        return self._parse_message(message) if message else None
+    
+    def _get_message(self, message_id: str, gone: List[str] = None, **params) -> Optional[Dict]:
+        """Get the Gmail message resource for an email; a deleted email is added to gone"""
+        params.setdefault('format', 'full')
+        
         try:
-            message = self.service.users().messages().get(
+            return self.rate_limiter.execute(self.service.users().messages().get(
                 userId='me', 
                 id=message_id,
-                format='full'
-            ).execute()
+                **params
+            ))
             
+        except HttpError as error:
+            if error.resp.status == 404 and gone is not None:
+                gone.append(message_id)
+            self.logger.error(f"An error occurred while fetching email details: {error}")
+            return None
+    
+    def _parse_message(self, message: Dict, include_body: bool = True) -> Optional[Dict]:
+        """Build email data from a Gmail message resource"""
+        try:
             headers = message['payload'].get('headers', [])
             
             # Extract email metadata
             email_data = {
-                'id': message_id,
+                'id': message['id'],
+                'account': self.gmail_address,
                 'thread_id': message.get('threadId'),
+                'received_at': int(message['internalDate']) / 1000 if 'internalDate' in message else None,
+                'labels': message.get('labelIds', []),
                 'subject': '',
                 'sender': '',
                 'date': '',
-                'body': ''
+                'body': '',
+                'headers': {}
             }
             
             # Parse headers
             for header in headers:
                 name = header['name'].lower()
+                email_data['headers'][name] = header['value']
                 if name == 'subject':
                     email_data['subject'] = header['value']
                 elif name == 'from':
@@ -105,49 +481,103 @@ class GmailClient:
                     email_data['date'] = header['value']
             
             # Extract email body
-            email_data['body'] = self._extract_email_body(message['payload'])
+            if include_body:
+                email_data['body'] = self._extract_email_body(message['payload'])
             
             return email_data
             
-        except HttpError as error:
-            self.logger.error(f"An error occurred while fetching email details: {error}")
+        except (KeyError, UnicodeDecodeError, ValueError) as error:
+            self.logger.error(f"Could not parse email {message.get('id')}: {error}")
             return None
     
     def _extract_email_body(self, payload) -> str:
         """Extract text body from email payload"""
-        body = ""
+        plain_part = None
+        html_part = None
         
-        if 'parts' in payload:
-            for part in payload['parts']:
-                if part['mimeType'] == 'text/plain':
-                    data = part['body']['data']
-                    body = base64.urlsafe_b64decode(data).decode('utf-8')
-                    break
-        else:
-            if payload['mimeType'] == 'text/plain':
-                data = payload['body']['data']
-                body = base64.urlsafe_b64decode(data).decode('utf-8')
+        # Walk the MIME tree with an explicit stack, in document order
+        stack = [payload]
+        while stack:
+            part = stack.pop()
+            
+            if part.get('parts'):
+                stack.extend(reversed(part['parts']))
+                continue
+            
+            # Skip attachments and parts whose content isn't inline
+            if part.get('filename') or not part.get('body', {}).get('data'):
+                continue
+            
+            mime_type = part.get('mimeType', '').lower()
+            if mime_type == 'text/plain':
+                plain_part = part
+                break
+            if mime_type == 'text/html' and html_part is None:
+                html_part = part
+        
+        if plain_part:
+            return self._decode_part(plain_part)
+        if html_part:
+            return self._html_to_text(self._decode_part(html_part))
+        return ""
+    
+    def _decode_part(self, part: Dict) -> str:
+        """Decode a body part, truncating it to MAX_BODY_BYTES before decoding"""
+        data = part['body']['data']
+        
+        # Every 4 base64 characters hold 3 bytes, so cut the encoded text first
+        max_chars = (Config.MAX_BODY_BYTES + 2) // 3 * 4
+        if len(data) > max_chars:
+            self.logger.debug(f"Truncating {len(data)} characters of encoded body to {max_chars}")
+            data = data[:max_chars]
+        
+        raw = base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))[:Config.MAX_BODY_BYTES]
+        
+        content_type = Message()
+        for header in part.get('headers', []):
+            if header['name'].lower() == 'content-type':
+                content_type['Content-Type'] = header['value']
+        charset = content_type.get_content_charset('utf-8')
+        
+        try:
+            return raw.decode(charset, errors='replace')
+        except LookupError:
+            return raw.decode('utf-8', errors='replace')
+    
+    def _html_to_text(self, html: str) -> str:
+        """Convert an HTML body to plain text"""
+        from bs4 import BeautifulSoup
         
-        return body
+        soup = BeautifulSoup(html, 'html.parser')
+        for element in soup(['script', 'style', 'head']):
+            element.decompose()
+        
+        lines = (line.strip() for line in soup.get_text('\n').splitlines())
+        return '\n'.join(line for line in lines if line)
+    
+    def _build_reply(self, to_email: str, subject: str, body: str, in_reply_to: str = None) -> str:
+        """Build a reply message and return it encoded for the API"""
+        message = MIMEText(body)
+        message['to'] = to_email
+        message['from'] = self.gmail_address
+        message['subject'] = f"Re: {subject}" if not subject.startswith('Re:') else subject
+        
+        if in_reply_to:
+            message['In-Reply-To'] = in_reply_to
+            message['References'] = in_reply_to
+        
+        return base64.urlsafe_b64encode(message.as_bytes()).decode()
     
     def send_email(self, to_email: str, subject: str, body: str, in_reply_to: str = None) -> bool:
         """Send an email"""
         try:
-            message = MIMEText(body)
-            message['to'] = to_email
-            message['from'] = Config.GMAIL_ADDRESS
-            message['subject'] = f"Re: {subject}" if not subject.startswith('Re:') else subject
+            raw_message = self._build_reply(to_email, subject, body, in_reply_to)
             
-            if in_reply_to:
-                message['In-Reply-To'] = in_reply_to
-                message['References'] = in_reply_to
-            
-            raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-            
-            send_message = self.service.users().messages().send(
+            # A 5xx may arrive after Gmail accepted the message, so only throttling is retried
+            send_message = self.rate_limiter.execute(self.service.users().messages().send(
                 userId='me',
                 body={'raw': raw_message}
-            ).execute()
+            ), retryable=RateLimiter.THROTTLED_STATUSES)
             
             self.logger.info(f"Email sent successfully to {to_email}")
             return True
@@ -156,18 +586,104 @@ class GmailClient:
             self.logger.error(f"An error occurred while sending email: {error}")
             return False
     
+    def create_draft(self, to_email: str, subject: str, body: str, in_reply_to: str = None, thread_id: str = None) -> bool:
+        """Save a reply as a Gmail draft for later review"""
+        try:
+            message = {'raw': self._build_reply(to_email, subject, body, in_reply_to)}
+            if thread_id:
+                message['threadId'] = thread_id
+            
+            self.rate_limiter.execute(self.service.users().drafts().create(
+                userId='me',
+                body={'message': message}
+            ), retryable=RateLimiter.THROTTLED_STATUSES)
+            
+            self.logger.info(f"Draft reply to {to_email} saved")
+            return True
+            
+        except HttpError as error:
+            self.logger.error(f"An error occurred while creating draft: {error}")
+            return False
+    
+    def watch(self, topic_name: str) -> Optional[Dict]:
+        """Ask Gmail to publish inbox changes to a Pub/Sub topic"""
+        try:
+            response = self.rate_limiter.execute(self.service.users().watch(
+                userId='me',
+                body={'topicName': topic_name, 'labelIds': ['INBOX']}
+            ))
+            
+            self.logger.info(f"Gmail watch active on {topic_name} until {response['expiration']}")
+            return response
+            
+        except HttpError as error:
+            self.logger.error(f"An error occurred while starting Gmail watch: {error}")
+            return None
+    
     def mark_as_read(self, message_id: str) -> bool:
         """Mark an email as read"""
+        if Config.BUFFER_LABEL_CHANGES:
+            self.modify_labels(message_id, remove_labels=['UNREAD'])
+            return True
+        
         try:
-            self.service.users().messages().modify(
+            self.rate_limiter.execute(self.service.users().messages().modify(
                 userId='me',
                 id=message_id,
                 body={'removeLabelIds': ['UNREAD']}
-            ).execute()
+            ))
             
+            self._notify_read([message_id])
             self.logger.info(f"Email {message_id} marked as read")
             return True
             
         except HttpError as error:
             self.logger.error(f"An error occurred while marking email as read: {error}")
-            return False
\ No newline at end of file
+            return False
+    
+    def modify_labels(self, message_id: str, add_labels: List[str] = None, remove_labels: List[str] = None):
+        """Queue a label change to be applied with the next batch flush"""
+        key = (tuple(add_labels or ()), tuple(remove_labels or ()))
+        
+        with self._labels_lock:
+            message_ids = self._pending_labels.setdefault(key, [])
+            if message_id not in message_ids:
+                message_ids.append(message_id)
+            pending = sum(len(ids) for ids in self._pending_labels.values())
+        
+        metrics.set_gauge('label_queue_depth', pending)
+        if pending >= Config.LABEL_FLUSH_SIZE:
+            self.flush_label_changes()
+    
+    def flush_label_changes(self) -> bool:
+        """Apply queued label changes with users.messages.batchModify"""
+        with self._labels_lock:
+            pending, self._pending_labels = self._pending_labels, {}
+        
+        metrics.set_gauge('label_queue_depth', 0)
+        success = True
+        for (add_labels, remove_labels), message_ids in pending.items():
+            # batchModify accepts at most 1000 IDs and applies each call as a whole
+            for start in range(0, len(message_ids), 1000):
+                chunk = message_ids[start:start + 1000]
+                try:
+                    self.rate_limiter.execute(self.service.users().messages().batchModify(
+                        userId='me',
+                        body={'ids': chunk, 'addLabelIds': list(add_labels), 'removeLabelIds': list(remove_labels)}
+                    ))
+                    self.logger.info(f"Label changes applied to {len(chunk)} emails")
+                    if 'UNREAD' in remove_labels:
+                        self._notify_read(chunk)
+                    
+                except HttpError as error:
+                    self.logger.error(f"An error occurred while applying label changes: {error}")
+                    
+                    # Keep the unapplied changes queued so the next flush retries them
+                    with self._labels_lock:
+                        queued = self._pending_labels.setdefault((add_labels, remove_labels), [])
+                        queued.extend(message_id for message_id in message_ids[start:] if message_id not in queued)
+                        metrics.set_gauge('label_queue_depth', sum(len(ids) for ids in self._pending_labels.values()))
+                    success = False
+                    break
+        
+        return success
\ No newline at end of file
@@ -1,31 +1,55 @@
 import time
+import json
 import logging
+import re
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from itertools import chain, zip_longest
 from datetime import datetime
 from colorama import init, Fore, Style
 from config import Config
 from gmail_client import GmailClient
 from ai_responder import AIResponder
-
-# Initialize colorama for colored output
-init()
+from metrics import metrics
+from policy import ReplyPolicy
+from push_listener import PubSubSubscriber, PushListener
+from state_store import StateStore
 
 class EmailAISystem:
-    def __init__(self):
+    # Compiled once; matches '<address>' or a bare address in a From header
+    EMAIL_PATTERN = re.compile(r'<([^>]+)>|([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})')
+    
+    def __init__(self, account=None, ai_responder=None, gmail_client=None):
         self.setup_logging()
         self.logger = logging.getLogger(__name__)
         
-        # Validate configuration
-        try:
-            Config.validate()
-        except ValueError as e:
-            self.logger.error(f"Configuration error: {e}")
-            sys.exit(1)
+        # Validate configuration; injected clients need no credentials
+        if gmail_client is None or ai_responder is None:
+            try:
+                Config.validate()
+            except ValueError as e:
+                self.logger.error(f"Configuration error: {e}")
+                sys.exit(1)
         
         # Initialize components
+        account = account or {}
         try:
-            self.gmail_client = GmailClient()
-            self.ai_responder = AIResponder()
+            self.gmail_client = gmail_client or GmailClient(
+                account.get('gmail_address'), account.get('token_file'), account.get('history_file')
+            )
+            self.ai_responder = ai_responder or AIResponder()
+            if account.get('gmail_address'):
+                # The responder may be shared, but approved replies must stay in their own mailbox
+                self.ai_responder.add_account(
+                    account['gmail_address'], account.get('similarity_file'), account.get('thread_context_file')
+                )
+            self.state_store = StateStore(account.get('state_file'))
+            self.gmail_client.read_listeners.append(self.record_acknowledged)
+            # Emails left mid-way by a skip or a restart are picked up again with their saved drafts
+            self.gmail_client.requeue(self.state_store.unfinished())
+            self.policy = ReplyPolicy() if Config.APPROVAL_MODE == 'policy' else None
+            self.draft_pool = None
+            self.send_pool = None
             self.logger.info("Email AI System initialized successfully")
         except Exception as e:
             self.logger.error(f"Failed to initialize system: {e}")
@@ -42,12 +66,23 @@ class EmailAISystem:
             ]
         )
     
+    def fetch_emails(self):
+        """Get emails that arrived since the last check and still need processing"""
+        prefilter = self.ai_responder.filter_batch if Config.PREFILTER_HEADERS else None
+        with metrics.timed('fetch'):
+            emails = self.gmail_client.get_new_emails(prefilter=prefilter)
+        metrics.inc('emails_fetched_total', len(emails))
+        
+        # Resume from recorded state so no email is replied to twice
+        emails = [email_data for email_data in emails if not self.is_already_handled(email_data)]
+        self.ai_responder.record_thread_messages(emails)
+        return emails
+    
     def process_emails(self):
         """Process unread emails and generate responses"""
         self.logger.info("Checking for unread emails...")
         
-        # Get unread emails
-        emails = self.gmail_client.get_unread_emails()
+        emails = self.fetch_emails()
         
         if not emails:
             self.logger.info("No unread emails found")
@@ -55,16 +90,260 @@ class EmailAISystem:
         
         print(f"\n{Fore.CYAN}Found {len(emails)} unread email(s){Style.RESET_ALL}")
         
+        if Config.BATCH_GENERATION and Config.COMBINED_ANALYSIS and len(emails) > 1:
+            self.process_batch(emails)
+            return
+        
+        if Config.PIPELINE_WORKERS > 1 and len(emails) > 1:
+            self.process_pipeline(emails)
+            return
+        
         for email_data in emails:
             try:
                 self.process_single_email(email_data)
             except Exception as e:
                 self.logger.error(f"Error processing email {email_data['id']}: {e}")
     
-    def process_single_email(self, email_data):
+    def process_pipeline(self, emails):
+        """Draft responses concurrently and review them as soon as they are ready"""
+        if self.draft_pool is None:
+            # Kept for the whole run, so worker threads keep their pooled Gmail connections between checks
+            self.draft_pool = ThreadPoolExecutor(max_workers=Config.PIPELINE_WORKERS, thread_name_prefix='draft')
+            self.send_pool = ThreadPoolExecutor(max_workers=Config.SEND_WORKERS, thread_name_prefix='send')
+        
+        self.draft_and_review([(self, email_data) for email_data in emails], self.draft_pool, self.send_pool)
+    
+    def shutdown_pools(self):
+        """Stop the pipeline worker threads"""
+        if self.draft_pool is not None:
+            self.draft_pool.shutdown()
+            self.send_pool.shutdown()
+            self.draft_pool = self.send_pool = None
+    
+    @staticmethod
+    def draft_and_review(queue, draft_pool, send_pool, show_mailbox=False):
+        """Draft (system, email) pairs on the draft pool, review them as they finish and send in the background"""
+        # Automated emails are skipped right away, the rest are drafted in parallel
+        drafts = {}
+        sends = []
+        for system, email_data in queue:
+            try:
+                if system.ai_responder.should_respond(email_data):
+                    drafts[draft_pool.submit(system.prepare_email, email_data)] = (system, email_data)
+                else:
+                    system.process_single_email(email_data)
+            except Exception as e:
+                system.logger.error(f"Error processing email {email_data['id']}: {e}")
+        metrics.set_gauge('draft_queue_depth', len(drafts))
+        
+        # Operators review drafts in the order they finish
+        for done, future in enumerate(as_completed(drafts), 1):
+            metrics.set_gauge('draft_queue_depth', len(drafts) - done)
+            system, email_data = drafts[future]
+            
+            def send_in_background(email_data, response, system=system):
+                sends.append(send_pool.submit(system.send_logged, email_data, response))
+            
+            try:
+                if show_mailbox:
+                    print(f"\n{Fore.MAGENTA}Mailbox: {system.gmail_client.gmail_address}{Style.RESET_ALL}")
+                system.process_single_email(email_data, draft=future.result(), send=send_in_background)
+            except Exception as e:
+                system.logger.error(f"Error processing email {email_data['id']}: {e}")
+        
+        # The pools outlive the check, so its sends are waited for before labels are flushed
+        wait(sends)
+    
+    def process_batch(self, emails):
+        """Draft all emails of a check with batched AI calls, then review them"""
+        print(f"{Fore.BLUE}Generating AI responses...{Style.RESET_ALL}")
+        
+        drafts = {}
+        candidates = []
+        for email_data in emails:
+            if not self.ai_responder.should_respond(email_data):
+                continue
+            
+            draft = self.stored_draft(email_data) or self.find_similar_draft(email_data)
+            if draft:
+                drafts[email_data['id']] = draft
+            else:
+                candidates.append(email_data)
+        
+        with metrics.timed('analyze_batch'):
+            analyses = self.ai_responder.analyze_batch(candidates)
+        
+        for email_id, analysis in analyses.items():
+            email_data = next(email_data for email_data in candidates if email_data['id'] == email_id)
+            drafts[email_id] = {
+                'sentiment': analysis['sentiment'],
+                'should_reply': analysis['should_reply'],
+                'response': analysis['draft'],
+                'confidence': analysis.get('confidence'),
+                'error': analysis.get('error')
+            }
+            self.log_usage(email_data)
+            self.record_draft(email_data, drafts[email_id])
+        
+        for email_data in emails:
+            try:
+                self.process_single_email(email_data, draft=drafts.get(email_data['id']))
+            except Exception as e:
+                self.logger.error(f"Error processing email {email_data['id']}: {e}")
+    
+    def is_already_handled(self, email_data):
+        """Check the recorded state of an email; replied ones are only marked as read again"""
+        state = self.state_store.get(email_data['id'])
+        
+        if state is None:
+            self.state_store.set_stage(email_data['id'], StateStore.FETCHED)
+            return False
+        
+        if state['stage'] in (StateStore.QUEUED, StateStore.SENT, StateStore.ACKNOWLEDGED):
+            self.logger.info(f"Email {email_data['id']} was already handled, marking as read")
+            self.acknowledge(email_data)
+            return True
+        
+        return False
+    
+    def stored_draft(self, email_data):
+        """Return a draft saved before a skip or restart, so it is not generated twice"""
+        state = self.state_store.get(email_data['id'])
+        if not state or state['stage'] != StateStore.DRAFTED or not state['draft']:
+            return None
+        
+        return {'sentiment': state['sentiment'], 'should_reply': True, 'response': state['draft']}
+    
+    def record_draft(self, email_data, draft):
+        """Save a generated draft in the state store"""
+        if draft['response']:
+            self.state_store.set_stage(email_data['id'], StateStore.DRAFTED, draft['sentiment'], draft['response'])
+        else:
+            self.state_store.set_stage(email_data['id'], StateStore.CLASSIFIED, draft['sentiment'])
+    
+    def find_similar_draft(self, email_data):
+        """Reuse an approved reply for near-duplicates before paying for an AI call"""
+        match = self.ai_responder.find_similar_response(email_data)
+        if not match:
+            return None
+        
+        return {
+            'sentiment': None,
+            'should_reply': True,
+            'response': match['response'],
+            'similarity': match['score'],
+            'confidence': match['score']
+        }
+    
+    def prepare_email(self, email_data):
+        """Analyze an email and draft a response; safe to run on worker threads"""
+        draft = self.stored_draft(email_data) or self.find_similar_draft(email_data)
+        if draft:
+            return draft
+        
+        if Config.COMBINED_ANALYSIS:
+            with metrics.timed('analyze', email_data['id']):
+                analysis = self.ai_responder.analyze_and_respond(email_data)
+            draft = {
+                'sentiment': analysis['sentiment'],
+                'should_reply': analysis['should_reply'],
+                'response': analysis['draft'],
+                'confidence': analysis.get('confidence'),
+                'error': analysis.get('error')
+            }
+        else:
+            with metrics.timed('sentiment', email_data['id']):
+                sentiment = self.ai_responder.analyze_email_sentiment(email_data)
+            with metrics.timed('generate', email_data['id']):
+                response = self.ai_responder.generate_response(email_data)
+            draft = {'sentiment': sentiment, 'should_reply': True, 'response': response}
+        
+        self.log_usage(email_data)
+        self.record_draft(email_data, draft)
+        return draft
+    
+    def stream_draft(self, email_data):
+        """Draft a response while printing it to the terminal as it streams in"""
+        draft = self.stored_draft(email_data) or self.find_similar_draft(email_data)
+        if draft:
+            return draft
+        
+        if Config.COMBINED_ANALYSIS:
+            return self.stream_analysis(email_data)
+        
+        with metrics.timed('sentiment', email_data['id']):
+            sentiment = self.ai_responder.analyze_email_sentiment(email_data)
+        print(f"Sentiment: {sentiment}")
+        
+        print(f"\n{Fore.GREEN}Generated Response:{Style.RESET_ALL}")
+        print("-" * 50)
+        
+        chunks = []
+        try:
+            with metrics.timed('generate', email_data['id']):
+                for chunk in self.ai_responder.stream_response(email_data):
+                    print(chunk, end='', flush=True)
+                    chunks.append(chunk)
+            response = ''.join(chunks).strip() or None
+        except Exception as e:
+            self.logger.error(f"Error streaming AI response: {e}")
+            response = None
+        
+        print()
+        print("-" * 50)
+        self.log_usage(email_data)
+        
+        draft = {'sentiment': sentiment, 'should_reply': True, 'response': response, 'streamed': True}
+        self.record_draft(email_data, draft)
+        return draft
+    
+    def stream_analysis(self, email_data):
+        """Stream the combined analysis, printing the draft as it arrives"""
+        print(f"\n{Fore.GREEN}Generated Response:{Style.RESET_ALL}")
+        print("-" * 50)
+        
+        chunks = []
+        def show(text):
+            print(text, end='', flush=True)
+            chunks.append(text)
+        
+        with metrics.timed('analyze', email_data['id']):
+            analysis = self.ai_responder.stream_analysis(email_data, show)
+        
+        print()
+        print("-" * 50)
+        self.log_usage(email_data)
+        
+        draft = {
+            'sentiment': analysis['sentiment'],
+            'should_reply': analysis['should_reply'],
+            'response': analysis['draft'],
+            'confidence': analysis.get('confidence'),
+            'error': analysis.get('error'),
+            # A fallback draft was never shown, so it still has to be printed in full
+            'streamed': bool(analysis['draft']) and ''.join(chunks).strip() == analysis['draft']
+        }
+        if draft['streamed']:
+            print(f"Sentiment: {draft['sentiment']}")
+        
+        self.record_draft(email_data, draft)
+        return draft
+    
+    def log_usage(self, email_data):
+        """Log the AI calls, tokens and latency spent on an email"""
+        usage = self.ai_responder.pop_usage(email_data['id'])
+        if usage:
+            self.logger.info(
+                f"AI usage for email {email_data['id']}: {usage['calls']} call(s), "
+                f"{usage['prompt_tokens']} input / {usage['output_tokens']} output tokens, "
+                f"{usage['tokens_saved']} tokens saved by compaction, {usage['latency']:.2f}s"
+            )
+    
+    def process_single_email(self, email_data, draft=None, send=None):
         """Process a single email"""
         sender = email_data['sender']
         subject = email_data['subject']
+        send = send or self.send_and_mark
         
         print(f"\n{Fore.YELLOW}Processing email:{Style.RESET_ALL}")
         print(f"From: {sender}")
@@ -73,22 +352,39 @@ class EmailAISystem:
         # Check if we should respond to this email
         if not self.ai_responder.should_respond(email_data):
             print(f"{Fore.RED}Skipping automated/invalid email{Style.RESET_ALL}")
-            self.gmail_client.mark_as_read(email_data['id'])
+            self.acknowledge(email_data)
             return
         
-        # Analyze sentiment
-        sentiment = self.ai_responder.analyze_email_sentiment(email_data)
-        print(f"Sentiment: {sentiment}")
+        # Analyze sentiment and generate AI response, unless a worker already did
+        if draft is None and Config.STREAM_RESPONSES:
+            draft = self.stream_draft(email_data)
+        elif draft is None:
+            print(f"{Fore.BLUE}Generating AI response...{Style.RESET_ALL}")
+            draft = self.prepare_email(email_data)
         
-        # Generate AI response
-        print(f"{Fore.BLUE}Generating AI response...{Style.RESET_ALL}")
-        response = self.ai_responder.generate_response(email_data)
+        if draft.get('similarity'):
+            print(f"{Fore.CYAN}Reusing approved reply for a similar email ({draft['similarity']:.0%} match){Style.RESET_ALL}")
+        elif not draft.get('streamed'):
+            print(f"Sentiment: {draft['sentiment']}")
+        
+        if not draft['should_reply']:
+            print(f"{Fore.YELLOW}AI found no reply necessary{Style.RESET_ALL}")
+            self.acknowledge(email_data)
+            return
+        
+        response = draft['response']
         
         if response:
-            print(f"\n{Fore.GREEN}Generated Response:{Style.RESET_ALL}")
-            print("-" * 50)
-            print(response)
-            print("-" * 50)
+            if not draft.get('streamed'):
+                print(f"\n{Fore.GREEN}Generated Response:{Style.RESET_ALL}")
+                print("-" * 50)
+                print(response)
+                print("-" * 50)
+            
+            # Unattended runs let the reply policy decide instead of the operator
+            if self.policy:
+                self.apply_policy(email_data, draft, response, send)
+                return
             
             # Ask user for confirmation
             while True:
@@ -96,13 +392,11 @@ class EmailAISystem:
                 
                 if choice == 'y':
                     # Send the response
-                    success = self.send_response(email_data, response)
-                    if success:
-                        self.gmail_client.mark_as_read(email_data['id'])
+                    send(email_data, response)
                     break
                 elif choice == 'n':
                     print(f"{Fore.RED}Response not sent{Style.RESET_ALL}")
-                    self.gmail_client.mark_as_read(email_data['id'])
+                    self.acknowledge(email_data)
                     break
                 elif choice == 'e':
                     # Edit response
@@ -116,26 +410,97 @@ class EmailAISystem:
                         response = '\n'.join(lines)
                         continue
                 elif choice == 's':
+                    # Behind the rest of the queue, so a run of skips can't hide the emails after it
                     print(f"{Fore.YELLOW}Email skipped{Style.RESET_ALL}")
+                    self.gmail_client.defer([email_data['id']])
                     break
                 else:
                     print("Please enter 'y' (yes), 'n' (no), 'e' (edit), or 's' (skip)")
+        elif draft.get('error'):
+            # The AI call itself failed (e.g. quota), so the email stays unread for the next check
+            print(f"{Fore.RED}Failed to generate response, will retry on the next check{Style.RESET_ALL}")
         else:
             print(f"{Fore.RED}Failed to generate response{Style.RESET_ALL}")
+            self.acknowledge(email_data)
+    
+    def apply_policy(self, email_data, draft, response, send):
+        """Send, save as a Gmail draft or skip a response as the reply policy decides"""
+        sender_email = self.extract_email_address(email_data['sender'])
+        action, reason = self.policy.decide(email_data, draft, response, sender_email)
+        self.logger.info(f"Policy decision for email {email_data['id']}: {action} ({reason})")
+        
+        if action == ReplyPolicy.SEND:
+            print(f"{Fore.GREEN}Policy: sending response ({reason}){Style.RESET_ALL}")
+            send(email_data, response)
+        elif action == ReplyPolicy.DRAFT:
+            print(f"{Fore.YELLOW}Policy: saving response as draft ({reason}){Style.RESET_ALL}")
+            self.queue_draft(email_data, response, sender_email)
+        else:
+            print(f"{Fore.RED}Policy: response not sent ({reason}){Style.RESET_ALL}")
+            self.acknowledge(email_data)
+    
+    def queue_draft(self, email_data, response, sender_email):
+        """Save the response as a Gmail draft for later review and mark the email as read"""
+        if not sender_email:
+            print(f"{Fore.RED}Could not extract sender email address{Style.RESET_ALL}")
+            return
+        
+        with metrics.timed('create_draft', email_data['id']):
+            saved = self.gmail_client.create_draft(
+                to_email=sender_email,
+                subject=email_data['subject'],
+                body=response,
+                in_reply_to=email_data['id'],
+                thread_id=email_data.get('thread_id')
+            )
+        
+        if saved:
+            # Committed right away so a restart can't save the same draft twice
+            self.state_store.set_stage(email_data['id'], StateStore.QUEUED, draft=response, durable=True)
+            self.acknowledge(email_data)
+        else:
+            print(f"{Fore.RED}Failed to save draft{Style.RESET_ALL}")
+    
+    def send_and_mark(self, email_data, response):
+        """Send the response and mark the email as read if it was delivered"""
+        if self.send_response(email_data, response):
+            # Committed right away so a crash before marking as read can't cause a second reply
+            self.state_store.set_stage(email_data['id'], StateStore.SENT, draft=response, durable=True)
+            self.acknowledge(email_data)
+            self.ai_responder.remember_approved_response(email_data, response)
+    
+    def send_logged(self, email_data, response):
+        """Send on a worker thread, logging errors the way process_emails does for the sequential path"""
+        try:
+            self.send_and_mark(email_data, response)
+        except Exception as e:
+            self.logger.error(f"Error sending response to email {email_data['id']}: {e}")
+    
+    def acknowledge(self, email_data):
+        """Mark an email as read; record_acknowledged records it as done once Gmail applied the change"""
+        with metrics.timed('mark_as_read', email_data['id']):
             self.gmail_client.mark_as_read(email_data['id'])
     
+    def record_acknowledged(self, message_ids):
+        """Record emails as done once they are no longer unread, after a later flush or in another client"""
+        for message_id in message_ids:
+            # Automated mail skipped by the header prefilter has no state to update
+            if self.state_store.get(message_id):
+                self.state_store.set_stage(message_id, StateStore.ACKNOWLEDGED)
+    
     def send_response(self, email_data, response):
         """Send the AI-generated response"""
         # Extract sender email from the 'From' field
         sender_email = self.extract_email_address(email_data['sender'])
         
         if sender_email:
-            success = self.gmail_client.send_email(
-                to_email=sender_email,
-                subject=email_data['subject'],
-                body=response,
-                in_reply_to=email_data['id']
-            )
+            with metrics.timed('send', email_data['id']):
+                success = self.gmail_client.send_email(
+                    to_email=sender_email,
+                    subject=email_data['subject'],
+                    body=response,
+                    in_reply_to=email_data['id']
+                )
             
             if success:
                 print(f"{Fore.GREEN}Response sent successfully!{Style.RESET_ALL}")
@@ -149,26 +514,179 @@ class EmailAISystem:
     
     def extract_email_address(self, from_field):
         """Extract email address from 'From' field"""
-        import re
-        
-        # Pattern to match email addresses
-        email_pattern = r'<([^>]+)>|([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})'
-        
-        match = re.search(email_pattern, from_field)
+        match = self.EMAIL_PATTERN.search(from_field)
         if match:
             return match.group(1) or match.group(2)
         return None
     
-    def run_continuous(self):
+    def create_push_listener(self):
+        """Create a push notification listener if Pub/Sub is configured"""
+        if not (Config.PUBSUB_TOPIC and Config.PUBSUB_SUBSCRIPTION):
+            return None
+        
+        subscriber = PubSubSubscriber(self.gmail_client.creds, Config.PUBSUB_SUBSCRIPTION)
+        return PushListener(subscriber, self.gmail_client, Config.PUBSUB_TOPIC)
+    
+    def log_ai_stats(self):
+        """Log response cache and Gemini latency statistics"""
+        cache_stats = self.ai_responder.get_cache_stats()
+        if cache_stats:
+            self.logger.info(
+                f"Response cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                f"{cache_stats['entries']} entries ({cache_stats['bytes']} bytes)"
+            )
+        
+        latency_stats = self.ai_responder.get_latency_stats()
+        if latency_stats:
+            self.logger.info(
+                f"Gemini latency over {latency_stats['count']} calls: "
+                f"first token p50 {latency_stats['first_token_p50']:.2f}s / p90 {latency_stats['first_token_p90']:.2f}s, "
+                f"total p50 {latency_stats['total_p50']:.2f}s / p90 {latency_stats['total_p90']:.2f}s / p99 {latency_stats['total_p99']:.2f}s"
+            )
+    
+    def run_continuous(self, push_listener=None):
         """Run the system continuously"""
+        push_listener = push_listener or self.create_push_listener()
+        metrics.start_server()
+        
         print(f"{Fore.GREEN}Email AI Response System Started{Style.RESET_ALL}")
         print(f"Monitoring: {Config.GMAIL_ADDRESS}")
-        print(f"Check interval: {Config.CHECK_INTERVAL} seconds")
+        if push_listener:
+            print(f"Mode: push notifications (fallback check every {Config.CHECK_INTERVAL} seconds)")
+        else:
+            print(f"Check interval: {Config.CHECK_INTERVAL} seconds")
         print(f"Press Ctrl+C to stop\n")
         
         try:
             while True:
                 self.process_emails()
+                with metrics.timed('flush_labels'):
+                    self.gmail_client.flush_label_changes()
+                self.state_store.commit()
+                
+                self.log_ai_stats()
+                
+                if push_listener:
+                    print(f"\n{Fore.CYAN}Waiting for new mail notifications...{Style.RESET_ALL}")
+                    push_listener.wait(Config.CHECK_INTERVAL)
+                else:
+                    print(f"\n{Fore.CYAN}Waiting {Config.CHECK_INTERVAL} seconds until next check...{Style.RESET_ALL}")
+                    time.sleep(Config.CHECK_INTERVAL)
+                
+        except KeyboardInterrupt:
+            print(f"\n{Fore.YELLOW}System stopped by user{Style.RESET_ALL}")
+            self.logger.info("Email AI system stopped by user")
+        finally:
+            self.shutdown_pools()
+            self.gmail_client.flush_label_changes()
+            self.state_store.close()
+            metrics.close()
+
+class MultiAccountRunner:
+    def __init__(self, accounts_file=None, systems=None):
+        self.logger = logging.getLogger(__name__)
+        self.systems = systems or []
+        ai_responder = self.systems[0].ai_responder if self.systems else None
+        
+        # All mailboxes share one Gemini client and request budget; injected systems skip the accounts file
+        if not self.systems:
+            for account in self.load_accounts(accounts_file or Config.ACCOUNTS_FILE):
+                system = EmailAISystem(account, ai_responder)
+                ai_responder = system.ai_responder
+                self.systems.append(system)
+        
+        self.ai_responder = ai_responder
+        # Shared by every mailbox and kept for the whole run, so worker threads keep their Gmail connections
+        self.draft_pool = ThreadPoolExecutor(max_workers=max(Config.PIPELINE_WORKERS, len(self.systems)), thread_name_prefix='draft')
+        self.send_pool = ThreadPoolExecutor(max_workers=Config.SEND_WORKERS, thread_name_prefix='send')
+        self.logger.info(f"Multi-account runner initialized with {len(self.systems)} mailboxes")
+    
+    @staticmethod
+    def load_accounts(path):
+        """Load account settings, filling in per-account file names"""
+        with open(path) as accounts_file:
+            accounts = json.load(accounts_file)
+        
+        for account in accounts:
+            if '@' not in account.get('gmail_address', ''):
+                raise ValueError(f"Invalid account in {path}: {account}")
+            
+            address = account['gmail_address']
+            account.setdefault('token_file', f"token_{address}.json")
+            account.setdefault('history_file', f"history_{address}.json")
+            account.setdefault('state_file', f"state_{address}.db")
+            account.setdefault('similarity_file', f"similarity_index_{address}.db")
+            account.setdefault('thread_context_file', f"thread_context_{address}.db")
+        
+        return accounts
+    
+    def process_all(self):
+        """Process new emails of every mailbox on a shared worker pool"""
+        fetched = list(self.draft_pool.map(self.fetch_account, self.systems))
+        
+        # Interleave mailboxes round-robin so a busy one can't starve the others
+        queue = [item for item in chain.from_iterable(zip_longest(*fetched)) if item]
+        if not queue:
+            self.logger.info("No unread emails found")
+            return
+        
+        print(f"\n{Fore.CYAN}Found {len(queue)} unread email(s) in {len(self.systems)} mailboxes{Style.RESET_ALL}")
+        
+        if Config.BATCH_GENERATION and Config.COMBINED_ANALYSIS:
+            # One batch per mailbox, since each reply has to come from the account that received the email
+            for system, items in zip(self.systems, fetched):
+                if items:
+                    print(f"\n{Fore.MAGENTA}Mailbox: {system.gmail_client.gmail_address}{Style.RESET_ALL}")
+                    system.process_batch([email_data for _, email_data in items])
+        elif Config.STREAM_RESPONSES:
+            # Streamed drafts are printed as they arrive, so emails are drafted one at a time
+            for system, email_data in queue:
+                try:
+                    print(f"\n{Fore.MAGENTA}Mailbox: {system.gmail_client.gmail_address}{Style.RESET_ALL}")
+                    system.process_single_email(email_data)
+                except Exception as e:
+                    system.logger.error(f"Error processing email {email_data['id']}: {e}")
+        else:
+            EmailAISystem.draft_and_review(queue, self.draft_pool, self.send_pool, show_mailbox=True)
+    
+    def fetch_account(self, system):
+        """Fetch one mailbox; a failing account (e.g. a revoked token) is logged and doesn't stop the others"""
+        try:
+            return [(system, email_data) for email_data in system.fetch_emails()]
+        except Exception as e:
+            self.logger.error(f"Error fetching emails for {system.gmail_client.gmail_address}: {e}")
+            return []
+    
+    def finish_check(self, system):
+        """Apply queued label changes and commit state of one mailbox"""
+        try:
+            system.gmail_client.flush_label_changes()
+        except Exception as e:
+            self.logger.error(f"Error applying label changes for {system.gmail_client.gmail_address}: {e}")
+        system.state_store.commit()
+    
+    def run_continuous(self):
+        """Run all mailboxes continuously"""
+        metrics.start_server()
+        print(f"{Fore.GREEN}Email AI Response System Started{Style.RESET_ALL}")
+        print(f"Monitoring {len(self.systems)} mailboxes:")
+        for system in self.systems:
+            print(f"  - {system.gmail_client.gmail_address}")
+        print(f"Check interval: {Config.CHECK_INTERVAL} seconds")
+        print(f"Press Ctrl+C to stop\n")
+        
+        if Config.PUBSUB_TOPIC or Config.PUBSUB_SUBSCRIPTION:
+            self.logger.warning("Push notifications are not supported with ACCOUNTS_FILE, polling every mailbox instead")
+        
+        try:
+            while True:
+                self.process_all()
+                for system in self.systems:
+                    self.finish_check(system)
+                
+                # The AI responder is shared, so its stats cover every mailbox
+                if self.systems:
+                    self.systems[0].log_ai_stats()
                 
                 print(f"\n{Fore.CYAN}Waiting {Config.CHECK_INTERVAL} seconds until next check...{Style.RESET_ALL}")
                 time.sleep(Config.CHECK_INTERVAL)
@@ -176,16 +694,29 @@ class EmailAISystem:
         except KeyboardInterrupt:
             print(f"\n{Fore.YELLOW}System stopped by user{Style.RESET_ALL}")
             self.logger.info("Email AI system stopped by user")
+        finally:
+            self.draft_pool.shutdown()
+            self.send_pool.shutdown()
+            for system in self.systems:
+                self.finish_check(system)
+                system.state_store.close()
+            metrics.close()
 
 def main():
     """Main function"""
+    # Initialize colorama for colored output
+    init()
+    
     print(f"{Fore.BLUE}{'='*60}")
     print(f"    EMAIL AI RESPONSE SYSTEM")
     print(f"    Powered by Google Gemini 2.0 Flash")
     print(f"{'='*60}{Style.RESET_ALL}\n")
     
     try:
-        system = EmailAISystem()
+        if Config.ACCOUNTS_FILE:
+            system = MultiAccountRunner()
+        else:
+            system = EmailAISystem()
         system.run_continuous()
     except Exception as e:
         print(f"{Fore.RED}System error: {e}{Style.RESET_ALL}")
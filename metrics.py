@@ -0,0 +1,193 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from config import Config
+
+class _StageTimer:
+    __slots__ = ('metrics', 'stage', 'email_id', 'start')
+    
+    def __init__(self, metrics, stage: str, email_id: Optional[str]):
+        self.metrics = metrics
+        self.stage = stage
+        self.email_id = email_id
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        self.metrics.observe('stage_duration_seconds', duration, stage=self.stage)
+        if exc_type is not None:
+            self.metrics.inc('stage_errors_total', stage=self.stage)
+        if self.email_id is not None:
+            self.metrics.trace(self.email_id, self.stage, duration, exc_type.__name__ if exc_type else None)
+        return False
+
+class Metrics:
+    PREFIX = 'email_ai_'
+    # Latency buckets in seconds, from local work up to slow Gemini calls
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    
+    def __init__(self, enabled: bool = None, trace_file: str = None):
+        self.logger = logging.getLogger(__name__)
+        self.enabled = Config.METRICS_ENABLED if enabled is None else enabled
+        self.trace_file = trace_file if trace_file is not None else Config.TRACE_FILE
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.server = None
+        self._trace = None
+        self._lock = threading.Lock()
+        self._null_timer = nullcontext()
+    
+    @staticmethod
+    def _key(name: str, labels: Dict) -> tuple:
+        """Identify a metric by its name and sorted labels"""
+        return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+    
+    def inc(self, name: str, value: float = 1, **labels):
+        """Add to a counter"""
+        if not self.enabled:
+            return
+        
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+    
+    def set_gauge(self, name: str, value: float, **labels):
+        """Set a gauge to its current value"""
+        if not self.enabled:
+            return
+        
+        with self._lock:
+            self.gauges[self._key(name, labels)] = value
+    
+    def observe(self, name: str, value: float, **labels):
+        """Record a value in a histogram"""
+        if not self.enabled:
+            return
+        
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * (len(self.BUCKETS) + 1), 0.0, 0]
+            histogram[0][bisect_left(self.BUCKETS, value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+    
+    def timed(self, stage: str, email_id: str = None):
+        """Time a pipeline stage; a shared no-op context when metrics are disabled"""
+        if not self.enabled:
+            return self._null_timer
+        return _StageTimer(self, stage, email_id)
+    
+    def trace(self, email_id: str, stage: str, duration: float, error: str = None):
+        """Append a stage timing of an email to the JSON lines trace file"""
+        if not self.trace_file:
+            return
+        
+        line = json.dumps({
+            'time': time.time(), 'email_id': email_id, 'stage': stage,
+            'duration': round(duration, 6), 'error': error
+        })
+        with self._lock:
+            if self._trace is None:
+                self._trace = open(self.trace_file, 'a', buffering=1)
+            self._trace.write(line + '\n')
+    
+    @staticmethod
+    def _format_labels(labels) -> str:
+        """Format label pairs as a Prometheus label set"""
+        if not labels:
+            return ''
+        
+        parts = []
+        for name, value in labels:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            parts.append(f'{name}="{value}"')
+        return '{' + ','.join(parts) + '}'
+    
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted((key, ([*h[0]], h[1], h[2])) for key, h in self.histograms.items())
+        
+        lines = []
+        typed = set()
+        
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+        
+        for (name, labels), value in counters:
+            declare(self.PREFIX + name, 'counter')
+            lines.append(f"{self.PREFIX}{name}{self._format_labels(labels)} {value}")
+        
+        for (name, labels), value in gauges:
+            declare(self.PREFIX + name, 'gauge')
+            lines.append(f"{self.PREFIX}{name}{self._format_labels(labels)} {value}")
+        
+        for (name, labels), (buckets, total, count) in histograms:
+            declare(self.PREFIX + name, 'histogram')
+            cumulative = 0
+            for bound, bucket in zip(self.BUCKETS, buckets):
+                cumulative += bucket
+                lines.append(f"{self.PREFIX}{name}_bucket{self._format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.PREFIX}{name}_bucket{self._format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.PREFIX}{name}_sum{self._format_labels(labels)} {total}")
+            lines.append(f"{self.PREFIX}{name}_count{self._format_labels(labels)} {count}")
+        
+        return '\n'.join(lines) + '\n'
+    
+    def start_server(self, port: int = None):
+        """Serve /metrics on localhost from a daemon thread"""
+        if not self.enabled or self.server:
+            return
+        
+        metrics = self
+        
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        port = port or Config.METRICS_PORT
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.logger.info(f"Metrics available at http://127.0.0.1:{port}/metrics")
+    
+    def close(self):
+        """Stop the metrics server and close the trace file"""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        
+        with self._lock:
+            if self._trace:
+                self._trace.close()
+                self._trace = None
+
+# Shared by all components, like the logging module
+metrics = Metrics()
@@ -0,0 +1,93 @@
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from config import Config
+
+class ReplyPolicy:
+    # Actions the policy can take for a drafted response
+    SEND = 'send'
+    DRAFT = 'draft'
+    SKIP = 'skip'
+    
+    # Without a policy file nothing is sent automatically, every response becomes a Gmail draft
+    DEFAULTS = {
+        'allowed_senders': [],
+        'blocked_senders': [],
+        'send_sentiments': ['positive', 'neutral'],
+        'skip_subject_patterns': [],
+        'draft_subject_patterns': [],
+        'min_confidence': 0.8,
+        'max_length': 1500
+    }
+    
+    def __init__(self, path: str = None, rules: Dict = None):
+        self.logger = logging.getLogger(__name__)
+        self.rules = dict(self.DEFAULTS)
+        self.rules.update(rules if rules is not None else self.load_rules(path or Config.POLICY_FILE))
+        
+        self.allowed_senders = [sender.lower() for sender in self.rules['allowed_senders']]
+        self.blocked_senders = [sender.lower() for sender in self.rules['blocked_senders']]
+        self.skip_subject = self._compile(self.rules['skip_subject_patterns'])
+        self.draft_subject = self._compile(self.rules['draft_subject_patterns'])
+    
+    def load_rules(self, path: str) -> Dict:
+        """Load policy rules from a JSON file; a missing file means the defaults"""
+        if not Path(path).exists():
+            self.logger.info(f"No policy file at {path}, all responses will be saved as drafts")
+            return {}
+        
+        with open(path) as policy_file:
+            rules = json.load(policy_file)
+        
+        unknown = set(rules) - set(self.DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown policy rules in {path}: {', '.join(sorted(unknown))}")
+        
+        return rules
+    
+    @staticmethod
+    def _compile(patterns) -> Optional[re.Pattern]:
+        """Combine subject patterns into one case-insensitive regex"""
+        if not patterns:
+            return None
+        return re.compile('|'.join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE)
+    
+    @staticmethod
+    def _matches_sender(address: str, senders) -> bool:
+        """Match an address against exact addresses, '@domain' entries or '*'"""
+        domain = address.rsplit('@', 1)[-1]
+        return any(
+            sender == '*' or sender == address or sender.lstrip('@') == domain
+            for sender in senders
+        )
+    
+    def decide(self, email_data: Dict, draft: Dict, response: str, sender_email: str = None) -> Tuple[str, str]:
+        """Decide whether to send, save as a draft or skip a response; returns the action and the reason"""
+        address = (sender_email or email_data.get('sender', '')).lower()
+        subject = email_data.get('subject', '')
+        
+        if self._matches_sender(address, self.blocked_senders):
+            return self.SKIP, 'blocked sender'
+        
+        if self.skip_subject and self.skip_subject.search(subject):
+            return self.SKIP, 'subject matches a skip pattern'
+        
+        if self.draft_subject and self.draft_subject.search(subject):
+            return self.DRAFT, 'subject matches a review pattern'
+        
+        if not self._matches_sender(address, self.allowed_senders):
+            return self.DRAFT, 'sender is not on the allowlist'
+        
+        if draft.get('sentiment') not in self.rules['send_sentiments']:
+            return self.DRAFT, f"sentiment {draft.get('sentiment')} needs review"
+        
+        confidence = draft.get('confidence')
+        if confidence is None or confidence < self.rules['min_confidence']:
+            return self.DRAFT, f"confidence {confidence} is below {self.rules['min_confidence']}"
+        
+        if len(response) > self.rules['max_length']:
+            return self.DRAFT, f"response is longer than {self.rules['max_length']} characters"
+        
+        return self.SEND, 'all rules passed'
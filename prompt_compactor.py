@@ -0,0 +1,122 @@
+import re
+from typing import Dict
+from config import Config
+
+class PromptCompactor:
+    # Reply headers that introduce the quoted history, e.g. "On Mon, ... wrote:"; an English attribution
+    # needs a date digit or an address before "wrote:", so prose like "On the other hand, as Ali wrote:" is kept
+    QUOTE_HEADER = re.compile(
+        r'^[ \t]*(On\b[^\n]{0,200}?[\d@][^\n]{0,200}?(\n[^\n]{0,200}?)?\bwrote:'
+        r'|On\b[^\n]{0,200}?\n[^\n]{0,200}?[\d@][^\n]{0,200}?\bwrote:'
+        r'|[^\n]{0,200}?tarihinde[^\n]{0,200}?(\n[^\n]{0,200}?)?yazdı:'
+        r'|-{2,}\s*(Original Message|Orijinal İleti|Özgün İleti)\s*-{2,}'
+        r'|_{20,}\s*\n\s*(From|Kimden):)',
+        re.MULTILINE | re.IGNORECASE
+    )
+    FORWARD_HEADER = re.compile(
+        r'^[ \t]*-{2,}\s*(Forwarded message|İletilen ileti|Forwarded Message)\s*-{2,}[ \t]*$',
+        re.MULTILINE | re.IGNORECASE
+    )
+    SIGNATURE_DELIMITER = re.compile(r'^-- ?$', re.MULTILINE)
+    MOBILE_SIGNATURE = re.compile(
+        r'^[ \t]*(Sent from my \w+|\w+\'(u|ü|i|ı)mdan gönderildi|Get Outlook for \w+)[ \t]*$',
+        re.MULTILINE | re.IGNORECASE
+    )
+    DISCLAIMER = re.compile(
+        r'intended recipient|this e-?mail and any attachments|confidential|disclaimer'
+        r'|privileged|unauthori[sz]ed|notify the sender'
+        r'|yasal uyarı|gizlilik uyarısı|bu e-posta ve ekleri|gizli bilgi|muhatabı değilseniz|yetkisiz',
+        re.IGNORECASE
+    )
+    FOOTER_SEPARATOR = re.compile(r'^[ \t]*([-_=*])\1{4,}[ \t]*$', re.MULTILINE)
+    # A single marker may be part of the request ("the pricing is confidential"), a footer has several
+    FOOTER_MIN_MARKERS = 2
+    
+    def __init__(self, max_tokens: int = None):
+        self.max_tokens = max_tokens or Config.PROMPT_BODY_TOKENS
+    
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Rough token count used for budgeting (about four characters per token)"""
+        return len(text) // 4
+    
+    def compact(self, body: str) -> Dict:
+        """Strip quoted history, signatures and boilerplate, then fit the token budget"""
+        text = body.replace('\r\n', '\n')
+        original_tokens = self.estimate_tokens(text)
+        
+        text = self._strip_quoted(text)
+        text = self._strip_signature(text)
+        text = self._strip_disclaimers(text)
+        text = self._truncate(text.strip())
+        
+        tokens = self.estimate_tokens(text)
+        return {
+            'text': text,
+            'original_tokens': original_tokens,
+            'tokens': tokens,
+            'tokens_saved': max(0, original_tokens - tokens)
+        }
+    
+    def _strip_quoted(self, text: str) -> str:
+        """Remove the quoted reply chain and '>' lines"""
+        match = self.QUOTE_HEADER.search(text)
+        if match and text[:match.start()].strip():
+            text = text[:match.start()]
+        
+        # A forward with nothing written above it is the message itself
+        match = self.FORWARD_HEADER.search(text)
+        if match:
+            if text[:match.start()].strip():
+                text = text[:match.start()]
+            else:
+                text = text[match.end():]
+        
+        return '\n'.join(line for line in text.split('\n') if not line.lstrip().startswith('>'))
+    
+    def _strip_signature(self, text: str) -> str:
+        """Remove everything after a signature delimiter and mobile client footers"""
+        match = self.SIGNATURE_DELIMITER.search(text)
+        if match and text[:match.start()].strip():
+            text = text[:match.start()]
+        return self.MOBILE_SIGNATURE.sub('', text)
+    
+    def _strip_disclaimers(self, text: str) -> str:
+        """Drop legal footer paragraphs from the end of the text, never the first paragraph"""
+        paragraphs = re.split(r'\n\s*\n', text)
+        end = len(paragraphs)
+        
+        while end > 1 and self._is_footer(paragraphs[end - 1], paragraphs[end - 2]):
+            end -= 1
+            # The separator line above a footer goes with it
+            if end > 1 and self.FOOTER_SEPARATOR.fullmatch(paragraphs[end - 1].strip()):
+                end -= 1
+        
+        return '\n\n'.join(paragraphs[:end])
+    
+    def _is_footer(self, paragraph: str, previous: str) -> bool:
+        """A footer has several legal markers, or one marker below a separator line"""
+        markers = {match.group(0).lower() for match in self.DISCLAIMER.finditer(paragraph)}
+        if len(markers) >= self.FOOTER_MIN_MARKERS:
+            return True
+        
+        separated = self.FOOTER_SEPARATOR.match(paragraph) or self.FOOTER_SEPARATOR.fullmatch(previous.strip())
+        return bool(markers and separated)
+    
+    def _truncate(self, text: str) -> str:
+        """Fit the text into the token budget, keeping its beginning and end"""
+        if self.estimate_tokens(text) <= self.max_tokens:
+            return text
+        
+        # The opening carries the request and the closing usually the question
+        budget = self.max_tokens * 4
+        head = text[:budget * 2 // 3]
+        tail = text[-(budget // 3):]
+        
+        # Cut on line boundaries where possible
+        if '\n' in head:
+            head = head[:head.rfind('\n')]
+        if '\n' in tail:
+            tail = tail[tail.find('\n') + 1:]
+        
+        return f"{head.rstrip()}\n[...]\n{tail.lstrip()}"
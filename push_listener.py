@@ -0,0 +1,114 @@
+import base64
+import json
+import logging
+import queue
+import time
+from typing import Dict, List, Optional
+from googleapiclient.errors import HttpError
+from config import Config
+
+class PubSubSubscriber:
+    def __init__(self, credentials, subscription: str):
+        self.logger = logging.getLogger(__name__)
+        self.subscription = subscription
+        
+        from googleapiclient.discovery import build
+        self.service = build('pubsub', 'v1', credentials=credentials, static_discovery=True, cache_discovery=False)
+    
+    def pull(self, timeout: float) -> List[Dict]:
+        """Pull and acknowledge pending Gmail notifications from the subscription"""
+        try:
+            response = self.service.projects().subscriptions().pull(
+                subscription=self.subscription,
+                body={'maxMessages': 100}
+            ).execute()
+            
+            received = response.get('receivedMessages', [])
+            if not received:
+                return []
+            
+            self.service.projects().subscriptions().acknowledge(
+                subscription=self.subscription,
+                body={'ackIds': [message['ackId'] for message in received]}
+            ).execute()
+            
+        except HttpError as error:
+            self.logger.error(f"An error occurred while pulling notifications: {error}")
+            time.sleep(min(timeout, Config.RATE_LIMIT_DELAY))
+            return []
+        
+        notifications = []
+        for message in received:
+            try:
+                data = base64.b64decode(message['message']['data'])
+                notifications.append(json.loads(data))
+            except (KeyError, ValueError) as error:
+                self.logger.warning(f"Ignoring malformed notification: {error}")
+        return notifications
+
+class LocalSubscriber:
+    # In-process stand-in for a Pub/Sub subscription, so push mode can run offline
+    def __init__(self):
+        self.queue = queue.Queue()
+    
+    def publish(self, email_address: str, history_id: str):
+        """Deliver a notification shaped like the ones Gmail publishes"""
+        self.queue.put({'emailAddress': email_address, 'historyId': history_id})
+    
+    def pull(self, timeout: float) -> List[Dict]:
+        """Wait up to timeout for notifications and return all that are queued"""
+        try:
+            notifications = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        
+        while True:
+            try:
+                notifications.append(self.queue.get_nowait())
+            except queue.Empty:
+                return notifications
+
+class PushListener:
+    # Gmail watches expire after 7 days; renew well before that
+    RENEW_MARGIN = 3600
+    
+    def __init__(self, subscriber, gmail_client=None, topic: str = None):
+        self.logger = logging.getLogger(__name__)
+        self.subscriber = subscriber
+        self.gmail_client = gmail_client
+        self.topic = topic
+        self.watch_expires_at = 0.0
+    
+    def _ensure_watch(self) -> bool:
+        """Start or renew the Gmail watch; returns whether notifications can be expected"""
+        if self.topic is None:
+            return True
+        
+        if time.time() < self.watch_expires_at - self.RENEW_MARGIN:
+            return True
+        
+        watch = self.gmail_client.watch(self.topic)
+        if not watch:
+            self.watch_expires_at = 0.0
+            return False
+        
+        self.watch_expires_at = int(watch['expiration']) / 1000
+        return True
+    
+    def wait(self, timeout: float) -> Optional[List[Dict]]:
+        """Block until mail notifications arrive; without an active watch just sleep, like polling"""
+        if not self._ensure_watch():
+            self.logger.warning("Gmail watch is not active, falling back to polling")
+            time.sleep(timeout)
+            return None
+        
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            
+            notifications = self.subscriber.pull(remaining)
+            if notifications:
+                self.logger.info(f"Received {len(notifications)} mail notification(s)")
+                return notifications
@@ -0,0 +1,144 @@
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Collection, Optional
+from config import Config
+from metrics import metrics
+
+class RateLimiter:
+    RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+    # A throttled call was rejected before it ran, so even non-idempotent calls can retry it
+    THROTTLED_STATUSES = {429}
+    
+    def __init__(self, name: str, rate: float, burst: int = None, max_attempts: int = None,
+                 base_delay: float = None, max_delay: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep,
+                 jitter: Callable[[], float] = random.random):
+        self.logger = logging.getLogger(__name__)
+        self.name = name
+        self.max_rate = rate
+        self.min_rate = rate / 16
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.max_attempts = max_attempts or Config.MAX_RESPONSE_ATTEMPTS
+        self.base_delay = base_delay if base_delay is not None else Config.RATE_LIMIT_DELAY
+        self.max_delay = max_delay
+        self.clock = clock
+        self.sleep = sleep
+        self.jitter = jitter
+        
+        self.tokens = float(self.capacity)
+        self.updated_at = clock()
+        self.blocked_until = 0.0
+        self.retries = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+    
+    def acquire(self, cost: int = 1):
+        """Block until the bucket holds enough tokens for a call"""
+        # Large batches are allowed to drain a full bucket rather than wait forever
+        cost = min(cost, self.capacity)
+        
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                # Tolerate float rounding, or a refill short by one ulp would wait forever on a coarse clock
+                elif self.tokens >= cost - 1e-9:
+                    self.tokens = max(0.0, self.tokens - cost)
+                    return
+                else:
+                    wait = (cost - self.tokens) / self.rate
+            
+            metrics.inc('rate_limit_wait_seconds_total', wait, api=self.name)
+            self.sleep(wait)
+    
+    def call(self, func: Callable, *args, cost: int = 1, retryable: Collection[int] = None, **kwargs):
+        """Run func under the rate limit, retrying throttled and server errors with backoff"""
+        retryable = self.RETRYABLE_STATUSES if retryable is None else retryable
+        
+        for attempt in range(1, self.max_attempts + 1):
+            self.acquire(cost)
+            metrics.inc('api_calls_total', api=self.name)
+            
+            try:
+                result = func(*args, **kwargs)
+            except Exception as error:
+                status = self.get_status(error)
+                metrics.inc('api_errors_total', api=self.name, status=status)
+                if status not in retryable or attempt == self.max_attempts:
+                    raise
+                
+                delay = self.get_retry_after(error)
+                if delay is None:
+                    delay = self.backoff(attempt)
+                
+                with self._lock:
+                    self.retries += 1
+                    if status == 429:
+                        # Back off for every caller sharing this budget and slow down
+                        self.throttled += 1
+                        self.rate = max(self.min_rate, self.rate / 2)
+                        self.blocked_until = max(self.blocked_until, self.clock() + delay)
+                
+                metrics.inc('api_retries_total', api=self.name, status=status)
+                self.logger.warning(
+                    f"{self.name} call failed with status {status}, retrying in {delay:.1f}s "
+                    f"(attempt {attempt}/{self.max_attempts})"
+                )
+                self.sleep(delay)
+                continue
+            
+            with self._lock:
+                # Recover towards the configured rate after successful calls
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+            return result
+    
+    def execute(self, request, cost: int = 1, retryable: Collection[int] = None):
+        """Execute a Google API client request under the rate limit"""
+        return self.call(request.execute, cost=cost, retryable=retryable)
+    
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff delay with jitter for the given attempt"""
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return delay / 2 + self.jitter() * delay / 2
+    
+    @staticmethod
+    def get_status(error: Exception) -> Optional[int]:
+        """Return the HTTP status of a Gmail or Gemini API error"""
+        resp = getattr(error, 'resp', None)
+        if resp is not None:
+            status = int(getattr(resp, 'status', 0))
+            
+            # Gmail reports per-user rate limits as 403
+            if status == 403 and 'ratelimitexceeded' in str(error).lower():
+                return 429
+            return status
+        
+        code = getattr(error, 'code', None)
+        return code if isinstance(code, int) else None
+    
+    @staticmethod
+    def get_retry_after(error: Exception) -> Optional[float]:
+        """Return the Retry-After delay in seconds if the error carries one"""
+        resp = getattr(error, 'resp', None)
+        value = resp.get('retry-after') if hasattr(resp, 'get') else None
+        if not value:
+            return None
+        
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
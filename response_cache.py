@@ -0,0 +1,126 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from config import Config
+
+class ResponseCache:
+    def __init__(self, path: str = None, ttl: int = None, max_bytes: int = None):
+        self.logger = logging.getLogger(__name__)
+        self.path = path or Config.CACHE_FILE
+        self.ttl = ttl if ttl is not None else Config.CACHE_TTL
+        self.max_bytes = max_bytes if max_bytes is not None else Config.CACHE_MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connect()
+    
+    def _connect(self):
+        """Open the cache database and create the schema"""
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS responses_created ON responses (created_at)')
+        self.conn.commit()
+        
+        # Running size of all entries, so inserts never have to sum the table
+        self._bytes = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        self.logger.info(f"Response cache opened at {self.path}")
+    
+    @staticmethod
+    def make_key(kind: str, prompt: str) -> str:
+        """Hash a prompt after collapsing whitespace so formatting noise still hits"""
+        normalized = ' '.join(prompt.split())
+        return hashlib.sha256(f"{kind}\0{normalized}".encode('utf-8')).hexdigest()
+    
+    def get(self, kind: str, prompt: str) -> Optional[str]:
+        """Return a cached value, or None if it is missing or expired"""
+        key = self.make_key(kind, prompt)
+        now = time.time()
+        
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT value, created_at, size FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self.conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                    self.conn.commit()
+                    self._bytes -= row[2]
+                self.misses += 1
+                return None
+            
+            self.conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+    
+    def set(self, kind: str, prompt: str, value: str):
+        """Store a value and evict least recently used entries over the size limit"""
+        key = self.make_key(kind, prompt)
+        size = len(value.encode('utf-8'))
+        now = time.time()
+        
+        with self._lock:
+            replaced = self.conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self.conn.execute(
+                'INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (key, value, size, now, now)
+            )
+            self._bytes += size - (replaced[0] if replaced else 0)
+            self._evict()
+            self.conn.commit()
+    
+    def _evict(self):
+        """Delete expired, then least recently used entries until the cache fits in max_bytes"""
+        if self._bytes <= self.max_bytes:
+            return
+        
+        # Both queries walk the created_at index over the expired rows only
+        expired_before = time.time() - self.ttl
+        self._bytes -= self.conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM responses WHERE created_at < ?', (expired_before,)
+        ).fetchone()[0]
+        self.conn.execute('DELETE FROM responses WHERE created_at < ?', (expired_before,))
+        
+        evicted = []
+        for key, size in self.conn.execute('SELECT key, size FROM responses ORDER BY accessed_at'):
+            if self._bytes <= self.max_bytes:
+                break
+            evicted.append((key,))
+            self._bytes -= size
+        
+        self.conn.executemany('DELETE FROM responses WHERE key = ?', evicted)
+        self.logger.debug(f"Evicted {len(evicted)} cached responses")
+    
+    def get_stats(self) -> Dict:
+        """Return hit/miss counters and cache size"""
+        with self._lock:
+            entries = self.conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+            lookups = self.hits + self.misses
+            
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': entries,
+                'bytes': self._bytes
+            }
+    
+    def close(self):
+        """Close the cache database"""
+        with self._lock:
+            self.conn.close()
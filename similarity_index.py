@@ -0,0 +1,149 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+import numpy as np
+from config import Config
+
+class SimilarityIndex:
+    # MinHash signature of NUM_PERM values, split into BANDS bands for LSH lookup
+    NUM_PERM = 64
+    BANDS = 16
+    SHINGLE_SIZE = 3
+    PRIME = (1 << 31) - 1
+    SEED = 20240501
+    # Upper bound on rows taken from each matching bucket, so near-duplicate inboxes stay fast
+    MAX_CANDIDATES = 256
+    
+    def __init__(self, path: str = None, threshold: float = None):
+        self.logger = logging.getLogger(__name__)
+        self.path = path or Config.SIMILARITY_FILE
+        self.threshold = threshold if threshold is not None else Config.SIMILARITY_THRESHOLD
+        self.rows = self.NUM_PERM // self.BANDS
+        
+        # A fixed seed keeps signatures comparable across restarts
+        rng = np.random.default_rng(self.SEED)
+        self._a = rng.integers(1, self.PRIME, size=(self.NUM_PERM, 1), dtype=np.uint64)
+        self._b = rng.integers(0, self.PRIME, size=(self.NUM_PERM, 1), dtype=np.uint64)
+        
+        # Signatures live in one matrix so candidates are scored in a single comparison
+        self._matrix = np.zeros((1024, self.NUM_PERM), dtype=np.uint32)
+        self._pair_ids = np.zeros(1024, dtype=np.int64)
+        self._count = 0
+        self._buckets = [{} for _ in range(self.BANDS)]
+        self._lock = threading.Lock()
+        self._connect()
+        self._load()
+    
+    def _connect(self):
+        """Open the index database and create the schema"""
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pairs (
+                id INTEGER PRIMARY KEY,
+                signature BLOB NOT NULL,
+                body TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+    
+    def _load(self):
+        """Rebuild the in-memory LSH buckets from stored signatures"""
+        for pair_id, blob in self.conn.execute('SELECT id, signature FROM pairs'):
+            self._insert(pair_id, np.frombuffer(blob, dtype=np.uint32))
+        self.logger.info(f"Similarity index loaded with {self._count} approved responses")
+    
+    def _insert(self, pair_id: int, signature: np.ndarray):
+        """Add a signature to the matrix and the in-memory buckets"""
+        if self._count == len(self._matrix):
+            self._matrix = np.concatenate([self._matrix, np.zeros_like(self._matrix)])
+            self._pair_ids = np.concatenate([self._pair_ids, np.zeros_like(self._pair_ids)])
+        
+        row = self._count
+        self._matrix[row] = signature
+        self._pair_ids[row] = pair_id
+        self._count += 1
+        
+        for band, bucket in enumerate(self._buckets):
+            key = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            bucket.setdefault(key, []).append(row)
+    
+    def _normalize(self, body: str) -> list:
+        """Lowercase words of an email body with the signature block removed"""
+        lines = body.split('\n')
+        
+        # Drop everything after a standard signature delimiter
+        for index, line in enumerate(lines):
+            if line.rstrip() == '--':
+                lines = lines[:index]
+                break
+        
+        return re.findall(r'\w+', '\n'.join(lines).lower())
+    
+    def signature(self, body: str) -> Optional[np.ndarray]:
+        """Compute the MinHash signature of an email body"""
+        words = self._normalize(body)
+        if len(words) < self.SHINGLE_SIZE:
+            return None
+        
+        shingles = {' '.join(words[i:i + self.SHINGLE_SIZE]) for i in range(len(words) - self.SHINGLE_SIZE + 1)}
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+            dtype=np.uint64, count=len(shingles)
+        ) % self.PRIME
+        
+        # (a * h + b) mod p for every permutation at once, then the minimum per row
+        permuted = (self._a * hashes + self._b) % self.PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+    
+    def find(self, body: str) -> Optional[Dict]:
+        """Return the closest approved response if it passes the similarity threshold"""
+        signature = self.signature(body)
+        if signature is None:
+            return None
+        
+        with self._lock:
+            # The newest rows of each matching bucket; recent approvals are the most relevant
+            candidates = []
+            for band, bucket in enumerate(self._buckets):
+                key = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+                candidates += bucket.get(key, [])[-self.MAX_CANDIDATES:]
+            
+            if not candidates:
+                return None
+            
+            rows = np.unique(np.array(candidates, dtype=np.int64))
+            scores = (self._matrix[rows] == signature).mean(axis=1)
+            best = int(scores.argmax())
+            best_score = float(scores[best])
+            if best_score < self.threshold:
+                return None
+            
+            row = self.conn.execute('SELECT response FROM pairs WHERE id = ?', (int(self._pair_ids[rows[best]]),)).fetchone()
+        
+        return {'response': row[0], 'score': best_score}
+    
+    def add(self, body: str, response: str):
+        """Store an approved response for an email body"""
+        signature = self.signature(body)
+        if signature is None:
+            return
+        
+        with self._lock:
+            cursor = self.conn.execute(
+                'INSERT INTO pairs (signature, body, response, created_at) VALUES (?, ?, ?, ?)',
+                (signature.tobytes(), body, response, time.time())
+            )
+            self.conn.commit()
+            self._insert(cursor.lastrowid, signature)
+    
+    def close(self):
+        """Close the index database"""
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,93 @@
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+from config import Config
+from metrics import metrics
+
+class StateStore:
+    # Processing stages in the order an email moves through them
+    FETCHED = 'fetched'
+    CLASSIFIED = 'classified'
+    DRAFTED = 'drafted'
+    QUEUED = 'queued'
+    SENT = 'sent'
+    ACKNOWLEDGED = 'acknowledged'
+    
+    def __init__(self, path: str = None, commit_every: int = None):
+        self.logger = logging.getLogger(__name__)
+        self.path = path or Config.STATE_FILE
+        self.commit_every = commit_every or Config.STATE_COMMIT_EVERY
+        self._uncommitted = 0
+        self._lock = threading.Lock()
+        self._connect()
+    
+    def _connect(self):
+        """Open the state database and create the schema"""
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                sentiment TEXT,
+                draft TEXT,
+                updated_at REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+        self.logger.info(f"State store opened at {self.path}")
+    
+    def get(self, message_id: str) -> Optional[Dict]:
+        """Return the recorded state of a message, or None if it was never seen"""
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT stage, sentiment, draft, updated_at FROM messages WHERE id = ?', (message_id,)
+            ).fetchone()
+        
+        if row is None:
+            return None
+        
+        return {'id': message_id, 'stage': row[0], 'sentiment': row[1], 'draft': row[2], 'updated_at': row[3]}
+    
+    def unfinished(self) -> List[str]:
+        """Return the IDs of messages that were fetched but never replied to or acknowledged"""
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT id FROM messages WHERE stage IN (?, ?, ?) ORDER BY updated_at',
+                (self.FETCHED, self.CLASSIFIED, self.DRAFTED)
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    def set_stage(self, message_id: str, stage: str, sentiment: str = None, draft: str = None, durable: bool = False):
+        """Record the stage a message reached; durable writes are committed immediately"""
+        with self._lock:
+            self.conn.execute("""
+                INSERT INTO messages (id, stage, sentiment, draft, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    stage = excluded.stage,
+                    sentiment = COALESCE(excluded.sentiment, sentiment),
+                    draft = COALESCE(excluded.draft, draft),
+                    updated_at = excluded.updated_at
+            """, (message_id, stage, sentiment, draft, time.time()))
+            
+            self._uncommitted += 1
+            metrics.inc('email_stage_total', stage=stage)
+            if durable or self._uncommitted >= self.commit_every:
+                self.conn.commit()
+                self._uncommitted = 0
+    
+    def commit(self):
+        """Commit any batched writes"""
+        with self._lock:
+            if self._uncommitted:
+                self.conn.commit()
+                self._uncommitted = 0
+    
+    def close(self):
+        """Commit batched writes and close the state database"""
+        self.commit()
+        with self._lock:
+            self.conn.close()
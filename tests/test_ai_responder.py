@@ -0,0 +1,80 @@
+import pytest
+from ai_responder import AIResponder
+from config import Config
+from fakes import FakeGenerativeModel, FakeResponse
+
+QUOTED = (
+    "\n\nOn Mon, 1 Jan 2024 at 10:00, Ayşe Yılmaz <ayse@musteri.example.com> wrote:\n"
+    + '\n'.join(f"> Line {index} of the earlier discussion about the order, delivery dates and pricing." for index in range(40))
+)
+
+@pytest.fixture
+def responder(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    for name, value in {
+        'SIMILARITY_ENABLED': True, 'PROMPT_COMPACTION': True, 'CACHE_ENABLED': False, 'THREAD_CONTEXT': False,
+        'GEMINI_REQUESTS_PER_MINUTE': 1e9, 'RATE_LIMIT_DELAY': 0,
+    }.items():
+        monkeypatch.setattr(Config, name, value)
+    return AIResponder(model=FakeGenerativeModel())
+
+def email(email_id: str, body: str) -> dict:
+    return {'id': email_id, 'sender': 'Ayşe Yılmaz <ayse@musteri.example.com>', 'subject': 'Sipariş', 'body': body}
+
+def test_shared_quoted_history_does_not_make_emails_similar(responder):
+    responder.remember_approved_response(
+        email('1', "Hi, is there any update on the quote you promised last week?" + QUOTED),
+        "We will send the updated quote tomorrow."
+    )
+    
+    assert responder.find_similar_response(email('2', "Hi, please cancel the order, we no longer need it." + QUOTED)) is None
+
+def test_same_request_matches_despite_different_quoted_history(responder):
+    request = "Hi, is there any update on the quote you promised last week? We need it before the meeting."
+    responder.remember_approved_response(email('1', request + QUOTED), "We will send the updated quote tomorrow.")
+    
+    match = responder.find_similar_response(email('2', request + "\n\n> An unrelated earlier message."))
+    assert match['response'] == "We will send the updated quote tomorrow."
+
+def test_failed_combined_call_does_not_fall_back_to_separate_calls(responder, monkeypatch):
+    responder._model = FakeGenerativeModel(error_rate=1, error_code=429)
+    
+    result = responder.analyze_and_respond(email('1', "Hi, is there any update on the quote?"))
+    
+    # Only the rate limiter's own retries of the combined call
+    assert sum(responder.model.calls.values()) == responder.rate_limiter.max_attempts
+    assert result['draft'] is None and result['sentiment'] is None
+    assert '429' in result['error']
+
+def test_unparseable_combined_response_falls_back_to_separate_calls(responder, monkeypatch):
+    model = FakeGenerativeModel()
+    generate = model.generate_content
+    monkeypatch.setattr(model, 'generate_content', lambda prompt, stream=False:
+                        FakeResponse('not json', 10, 2) if '"should_reply"' in prompt else generate(prompt, stream))
+    responder._model = model
+    
+    result = responder.analyze_and_respond(email('1', "Hi, is there any update on the quote?"))
+    
+    assert result['draft'] and result['sentiment'] in AIResponder.SENTIMENTS
+    assert 'error' not in result
+
+def test_streamed_analysis_shows_the_draft_and_keeps_the_decision(responder):
+    shown = []
+    result = responder.stream_analysis(email('1', "Hi, is there any update on the quote?"), shown.append)
+    
+    # One combined call, with the draft passed on piece by piece as the JSON arrives
+    assert responder.model.calls == {'combined': 1}
+    assert len(shown) > 1 and ''.join(shown) == result['draft']
+    assert result['should_reply'] is True and result['confidence'] is not None
+
+def test_thread_context_follows_arrival_order(responder, monkeypatch):
+    monkeypatch.setattr(Config, 'THREAD_CONTEXT', True)
+    responder = AIResponder(model=FakeGenerativeModel())
+    older = dict(email('1', "Hi, could you send a quote for 40 licences?"), thread_id='t1', received_at=1000.0)
+    newer = dict(email('2', "Following up: we now need 60 licences instead."), thread_id='t1', received_at=2000.0)
+    
+    # Gmail lists the newest message first
+    responder.record_thread_messages([newer, older])
+    
+    assert '60 licences' not in responder._create_combined_prompt(older)
+    assert '40 licences' in responder._format_email(newer).split('GELEN E-POSTA')[0]
@@ -0,0 +1,54 @@
+import logging
+from pathlib import Path
+import pytest
+from classifier import AutomatedSenderClassifier, HashedLogisticModel, evaluate, load_labeled
+
+LABELED = Path(__file__).parent / 'fixtures' / 'automated_senders.jsonl'
+
+def person(**fields) -> dict:
+    return dict({'id': 'msg1', 'sender': 'Ayşe Yılmaz <ayse@musteri.example.com>', 'subject': 'Teklif', 'headers': {}}, **fields)
+
+@pytest.mark.parametrize('email_data', [
+    person(sender='GitHub <noreply@github.com>'),
+    person(subject='Delivery Failure: Teklif'),
+    person(headers={'list-unsubscribe': '<mailto:unsub@example.com>'}),
+    person(headers={'auto-submitted': 'auto-replied'}),
+    person(headers={'precedence': 'Bulk'}),
+])
+def test_rules_flag_automated_mail(email_data):
+    assert AutomatedSenderClassifier(rules={}, model=None).classify_batch([email_data]) == [True]
+
+def test_rules_keep_personal_mail_and_extra_rules_extend_them():
+    email_data = person(subject='Kampanya hakkında')
+    
+    assert AutomatedSenderClassifier(rules={}, model=None).classify_batch([email_data]) == [False]
+    assert AutomatedSenderClassifier(rules={'keywords': ['kampanya']}, model=None).classify_batch([email_data]) == [True]
+
+def test_unknown_rule_set_is_rejected():
+    with pytest.raises(ValueError):
+        AutomatedSenderClassifier(rules={'senders': ['x']}, model=None)
+
+def test_rules_on_labeled_fixture():
+    emails, labels = load_labeled(str(LABELED))
+    result = evaluate(AutomatedSenderClassifier(rules={}, model=None).classify_batch(emails), labels)
+    
+    assert result['precision'] >= 0.8 and result['recall'] >= 0.6
+
+def test_model_is_opt_in(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    HashedLogisticModel().save('classifier_model.npz')
+    
+    # A model file in the working directory isn't picked up unless CLASSIFIER_MODEL_FILE names it
+    assert AutomatedSenderClassifier(rules={}).model is None
+
+def test_model_scores_only_rule_misses_and_logs_its_skips(caplog):
+    # A model that flags everything, so every email it sees is a skip
+    classifier = AutomatedSenderClassifier(rules={}, model=HashedLogisticModel(bias=5.0), threshold=0.5)
+    emails = [person(id='msg1'), person(id='msg2', sender='noreply@shop.example.com')]
+    
+    with caplog.at_level(logging.INFO, logger='classifier'):
+        assert classifier.classify_batch(emails) == [True, True]
+    
+    flagged = [record.getMessage() for record in caplog.records if 'Model flagged' in record.getMessage()]
+    assert len(flagged) == 1 and 'msg1' in flagged[0]
+    assert classifier.classify_batch([]) == []
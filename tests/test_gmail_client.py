@@ -0,0 +1,135 @@
+import email
+import json
+from email.mime.text import MIMEText
+from pathlib import Path
+import pytest
+from config import Config
+from fakes import FakeGmailService, generate_inbox, message_to_payload
+from gmail_client import GmailClient
+
+@pytest.fixture(autouse=True)
+def sync_config(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Config, 'INCREMENTAL_SYNC', True)
+    monkeypatch.setattr(Config, 'BATCH_FETCH', True)
+    monkeypatch.setattr(Config, 'BUFFER_LABEL_CHANGES', True)
+    monkeypatch.setattr(Config, 'MAX_EMAILS_PER_CHECK', 5)
+    monkeypatch.setattr(Config, 'RATE_LIMIT_DELAY', 0)
+    monkeypatch.setattr(Config, 'GMAIL_REQUESTS_PER_SECOND', 1e6)
+
+def make_client(service: FakeGmailService) -> GmailClient:
+    return GmailClient(service.email_address, history_file='history.json', service=service)
+
+def ids(emails) -> list:
+    return [email_data['id'] for email_data in emails]
+
+def pending() -> list:
+    with open('history.json') as history_file:
+        return json.load(history_file)['pending']
+
+def deliver(service: FakeGmailService, messages: list):
+    for message in messages:
+        service.deliver(message)
+
+@pytest.fixture
+def service():
+    return FakeGmailService(generate_inbox(3, seed=1, automated_ratio=0))
+
+def test_failed_fetch_keeps_email_pending(service):
+    client = make_client(service)
+    client.get_new_emails()
+    client.mark_as_read('msg000000')
+    client.flush_label_changes()
+    
+    service.failing['messages.get'] = 500
+    assert client.get_new_emails() == []
+    assert set(pending()) == {'msg000001', 'msg000002'}
+    
+    del service.failing['messages.get']
+    assert ids(client.get_new_emails()) == ['msg000001', 'msg000002']
+
+def test_unacknowledged_emails_survive_a_restart(service):
+    fetched = ids(make_client(service).get_new_emails())
+    
+    # A crash before acknowledging: the next process sees the same emails again
+    assert ids(make_client(service).get_new_emails()) == fetched
+
+def test_skipped_email_comes_back_until_marked_as_read(service):
+    client = make_client(service)
+    client.get_new_emails()
+    for message_id in ('msg000000', 'msg000002'):
+        client.mark_as_read(message_id)
+    client.flush_label_changes()
+    
+    assert ids(client.get_new_emails()) == ['msg000001']
+    assert ids(client.get_new_emails()) == ['msg000001']
+    
+    client.mark_as_read('msg000001')
+    client.flush_label_changes()
+    assert client.get_new_emails() == []
+    assert pending() == []
+
+def test_queued_label_change_does_not_remove_email_from_pending(service):
+    client = make_client(service)
+    client.get_new_emails()
+    
+    service.failing['messages.batchModify'] = 400
+    client.mark_as_read('msg000000')
+    client.flush_label_changes()
+    assert 'msg000000' in pending()
+    
+    del service.failing['messages.batchModify']
+    client.flush_label_changes()
+    assert 'msg000000' not in pending()
+
+def test_new_mail_comes_before_backlog():
+    backlog = generate_inbox(20, seed=2, automated_ratio=0)
+    service = FakeGmailService(backlog)
+    client = make_client(service)
+    client.get_new_emails()
+    
+    fresh = generate_inbox(22, seed=3, automated_ratio=0)[20:]
+    deliver(service, fresh)
+    
+    # Newest first, like the is:unread listing
+    assert ids(client.get_new_emails())[:2] == ['msg000021', 'msg000020']
+
+def test_read_and_deleted_emails_leave_pending(service):
+    client = make_client(service)
+    client.get_new_emails()
+    
+    service.messages['msg000000']['labelIds'].remove('UNREAD')
+    del service.messages['msg000001']
+    
+    assert ids(client.get_new_emails()) == ['msg000002']
+    assert pending() == ['msg000002']
+
+MIME_CORPUS = Path(__file__).parent / 'fixtures' / 'mime'
+MIME_CASES = sorted(path.stem for path in MIME_CORPUS.glob('*.eml'))
+
+def extract(message) -> str:
+    return make_client(FakeGmailService())._extract_email_body(message_to_payload(message))
+
+@pytest.mark.parametrize('name', MIME_CASES)
+def test_mime_corpus(name):
+    with open(MIME_CORPUS / f"{name}.eml", 'rb') as eml:
+        message = email.message_from_binary_file(eml)
+    
+    expected = (MIME_CORPUS / f"{name}.expected.txt").read_text(encoding='utf-8')
+    assert extract(message).rstrip('\n') == expected.rstrip('\n')
+
+def test_mime_corpus_covers_charsets_html_and_forwards():
+    assert {'latin5_plain', 'windows1254_html_only', 'forwarded_rfc822_only', 'unknown_charset'} <= set(MIME_CASES)
+
+@pytest.mark.parametrize('subtype', ['plain', 'html'])
+def test_oversized_body_is_cut_at_max_body_bytes(monkeypatch, subtype):
+    monkeypatch.setattr(Config, 'MAX_BODY_BYTES', 1000)
+    line = "Siparişim hâlâ kargoya verilmedi, ne zaman gönderilecek?"
+    text = '\n'.join([line] * 500)
+    body = text if subtype == 'plain' else f"<p>{text}</p>"
+    
+    extracted = extract(MIMEText(body, subtype, 'iso-8859-9'))
+    
+    # ISO-8859-9 has one byte per character, so the cut keeps at most 1000 characters
+    assert extracted.startswith(f"{line}\n{line}")
+    assert len(extracted) <= 1000
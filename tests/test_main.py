@@ -0,0 +1,238 @@
+import logging
+import pytest
+from ai_responder import AIResponder
+from config import Config
+from fakes import FakeGenerativeModel, FakeGmailService, generate_inbox
+from gmail_client import GmailClient
+from main import EmailAISystem
+from policy import ReplyPolicy
+from state_store import StateStore
+
+# Every draft passes the policy, so each email is sent
+SEND_ALL = {'allowed_senders': ['*'], 'send_sentiments': ReplyPolicy.DEFAULTS['send_sentiments'] + ['negative', 'urgent'],
+            'min_confidence': 0}
+
+@pytest.fixture(autouse=True)
+def system_config(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    for name, value in {
+        'INCREMENTAL_SYNC': True, 'BATCH_FETCH': True, 'BUFFER_LABEL_CHANGES': True, 'MAX_EMAILS_PER_CHECK': 5,
+        'RATE_LIMIT_DELAY': 0, 'GMAIL_REQUESTS_PER_SECOND': 1e6, 'GEMINI_REQUESTS_PER_MINUTE': 1e9,
+        'APPROVAL_MODE': 'policy', 'STREAM_RESPONSES': False, 'PIPELINE_WORKERS': 1, 'BATCH_GENERATION': False,
+        'CACHE_ENABLED': False, 'SIMILARITY_ENABLED': False, 'PREFILTER_HEADERS': False,
+    }.items():
+        monkeypatch.setattr(Config, name, value)
+
+def make_system(service: FakeGmailService, model: FakeGenerativeModel = None) -> EmailAISystem:
+    system = EmailAISystem(
+        {'gmail_address': service.email_address},
+        AIResponder(model=model or FakeGenerativeModel(reply_rate=1.0)),
+        GmailClient(service.email_address, history_file='history.json', service=service)
+    )
+    if system.policy:
+        system.policy = ReplyPolicy(rules=SEND_ALL)
+    return system
+
+def run_check(system: EmailAISystem):
+    """One iteration of EmailAISystem.run_continuous without the wait"""
+    system.process_emails()
+    system.gmail_client.flush_label_changes()
+    system.state_store.commit()
+
+@pytest.fixture
+def service():
+    return FakeGmailService(generate_inbox(3, seed=1, automated_ratio=0))
+
+def test_pipeline_logs_errors_from_background_sends(service, monkeypatch, caplog):
+    monkeypatch.setattr(Config, 'PIPELINE_WORKERS', 2)
+    system = make_system(service)
+    
+    def broken_send(*args, **kwargs):
+        raise RuntimeError('connection reset')
+    monkeypatch.setattr(system.gmail_client, 'send_email', broken_send)
+    
+    with caplog.at_level(logging.ERROR):
+        run_check(system)
+    
+    errors = [record.getMessage() for record in caplog.records if 'Error sending response' in record.getMessage()]
+    assert len(errors) == 3
+    assert all('connection reset' in error for error in errors)
+
+def test_failed_label_flush_leaves_email_unacknowledged(service):
+    system = make_system(service)
+    service.failing['messages.batchModify'] = 500
+    run_check(system)
+    
+    # The queued UNREAD removal is lost with the process
+    assert len(service.sent) == 3
+    assert {system.state_store.get(message_id)['stage'] for message_id in service.messages} == {StateStore.SENT}
+    system.state_store.close()
+    
+    del service.failing['messages.batchModify']
+    system = make_system(service)
+    run_check(system)
+    
+    assert len(service.sent) == 3
+    assert all('UNREAD' not in message['labelIds'] for message in service.messages.values())
+    assert {system.state_store.get(message_id)['stage'] for message_id in service.messages} == {StateStore.ACKNOWLEDGED}
+
+def answer(monkeypatch, *choices):
+    """Answer the approval prompts in order"""
+    replies = iter(choices)
+    monkeypatch.setattr('builtins.input', lambda prompt='': next(replies))
+
+def test_skipped_email_is_offered_again_with_its_saved_draft(service, monkeypatch):
+    monkeypatch.setattr(Config, 'APPROVAL_MODE', 'interactive')
+    model = FakeGenerativeModel(reply_rate=1.0)
+    system = make_system(service, model)
+    
+    answer(monkeypatch, 's', 'n', 'n')
+    run_check(system)
+    calls = sum(model.calls.values())
+    assert system.state_store.get('msg000000')['stage'] == StateStore.DRAFTED
+    
+    answer(monkeypatch, 'y')
+    run_check(system)
+    
+    assert sum(model.calls.values()) == calls
+    assert len(service.sent) == 1
+    assert 'UNREAD' not in service.messages['msg000000']['labelIds']
+
+def test_unfinished_emails_are_requeued_on_restart(service):
+    system = make_system(service)
+    system.gmail_client.get_new_emails()
+    for message_id in service.messages:
+        system.state_store.set_stage(message_id, StateStore.DRAFTED, 'neutral', 'Saved draft')
+    system.state_store.close()
+    
+    # A history file written before unacknowledged emails were kept pending
+    system.gmail_client._save_sync_state(system.gmail_client._load_sync_state()['history_id'], [])
+    
+    model = FakeGenerativeModel(reply_rate=1.0)
+    system = make_system(service, model)
+    run_check(system)
+    
+    # Every email was answered from its saved draft, without a Gemini call
+    assert sum(model.calls.values()) == 0
+    assert len(service.sent) + len(service.drafts) == 3
+    assert {system.state_store.get(message_id)['stage'] for message_id in service.messages} == {StateStore.ACKNOWLEDGED}
+
+def make_accounts(model: FakeGenerativeModel, *addresses: str) -> list:
+    """Systems for several mailboxes sharing one AI responder, as MultiAccountRunner builds them"""
+    systems = []
+    ai_responder = AIResponder(model=model)
+    for address in addresses:
+        service = FakeGmailService(generate_inbox(2, seed=1, automated_ratio=0), email_address=address)
+        system = EmailAISystem(
+            {'gmail_address': address, 'state_file': f"state_{address}.db"}, ai_responder,
+            GmailClient(address, history_file=f"history_{address}.json", service=service)
+        )
+        system.policy = ReplyPolicy(rules=SEND_ALL)
+        systems.append(system)
+    return systems
+
+def test_failing_account_does_not_stop_other_mailboxes(monkeypatch, caplog):
+    from google.auth.exceptions import RefreshError
+    from main import MultiAccountRunner
+    
+    systems = make_accounts(FakeGenerativeModel(reply_rate=1.0), 'revoked@example.com', 'destek@example.com')
+    
+    def revoked(*args, **kwargs):
+        raise RefreshError('invalid_grant: Token has been expired or revoked.')
+    monkeypatch.setattr(systems[0].gmail_client, 'get_new_emails', revoked)
+    
+    runner = MultiAccountRunner(systems=systems)
+    with caplog.at_level(logging.ERROR):
+        runner.process_all()
+    
+    assert len(systems[1].gmail_client.service.sent) == 2
+    assert any('revoked@example.com' in record.getMessage() for record in caplog.records)
+
+def test_failed_ai_call_leaves_email_unread_for_the_next_check(service, monkeypatch):
+    system = make_system(service, FakeGenerativeModel(error_rate=1, error_code=429))
+    monkeypatch.setattr(system.ai_responder.rate_limiter, 'base_delay', 0)
+    run_check(system)
+    
+    assert service.sent == [] and service.drafts == []
+    assert all('UNREAD' in message['labelIds'] for message in service.messages.values())
+    assert len(system.gmail_client._load_sync_state()['pending']) == 3
+
+def test_streamed_drafts_use_the_combined_analysis(service, monkeypatch):
+    monkeypatch.setattr(Config, 'STREAM_RESPONSES', True)
+    model = FakeGenerativeModel(reply_rate=1.0)
+    system = make_system(service, model)
+    run_check(system)
+    
+    assert model.calls == {'combined': 3}
+    assert len(service.sent) == 3
+
+def test_emails_read_or_deleted_elsewhere_are_finished(service, monkeypatch):
+    system = make_system(service, FakeGenerativeModel(error_rate=1, error_code=429))
+    monkeypatch.setattr(system.ai_responder.rate_limiter, 'base_delay', 0)
+    run_check(system)
+    
+    read, deleted, waiting = sorted(service.messages)
+    service.messages[read]['labelIds'].remove('UNREAD')
+    del service.messages[deleted]
+    run_check(system)
+    
+    assert system.state_store.get(read)['stage'] == StateStore.ACKNOWLEDGED
+    assert system.state_store.get(deleted)['stage'] == StateStore.ACKNOWLEDGED
+    assert system.state_store.unfinished() == [waiting]
+    assert system.gmail_client._load_sync_state()['pending'] == [waiting]
+
+def test_skipped_emails_do_not_hide_the_rest_of_the_backlog(monkeypatch):
+    monkeypatch.setattr(Config, 'APPROVAL_MODE', 'interactive')
+    monkeypatch.setattr(Config, 'MAX_EMAILS_PER_CHECK', 2)
+    service = FakeGmailService(generate_inbox(6, seed=1, automated_ratio=0))
+    system = make_system(service)
+    
+    monkeypatch.setattr('builtins.input', lambda prompt='': 's')
+    for _ in range(3):
+        run_check(system)
+    
+    assert {system.state_store.get(message_id)['stage'] for message_id in service.messages} == {StateStore.DRAFTED}
+    assert service.sent == []
+
+@pytest.mark.parametrize('setting, calls', [('BATCH_GENERATION', {'batch': 2}), ('STREAM_RESPONSES', {'combined': 4})])
+def test_multi_account_runner_honours_generation_settings(monkeypatch, setting, calls):
+    from main import MultiAccountRunner
+    
+    monkeypatch.setattr(Config, setting, True)
+    model = FakeGenerativeModel(reply_rate=1.0)
+    generate = model.generate_content
+    streamed = []
+    def recording(prompt, stream=False):
+        streamed.append(stream)
+        return generate(prompt, stream)
+    monkeypatch.setattr(model, 'generate_content', recording)
+    
+    systems = make_accounts(model, 'satis@example.com', 'destek@example.com')
+    MultiAccountRunner(systems=systems).process_all()
+    
+    assert model.calls == calls
+    assert all(streamed) == (setting == 'STREAM_RESPONSES')
+    assert all(len(system.gmail_client.service.sent) == 2 for system in systems)
+
+def test_pipeline_keeps_its_worker_threads_between_checks(monkeypatch):
+    import threading
+    monkeypatch.setattr(Config, 'PIPELINE_WORKERS', 2)
+    inbox = generate_inbox(6, seed=1, automated_ratio=0)
+    service = FakeGmailService(inbox[:3])
+    system = make_system(service)
+    
+    workers = set()
+    prepare = system.prepare_email
+    def recording(email_data):
+        workers.add(threading.current_thread())
+        return prepare(email_data)
+    monkeypatch.setattr(system, 'prepare_email', recording)
+    
+    run_check(system)
+    for message in inbox[3:]:
+        service.deliver(message)
+    run_check(system)
+    system.shutdown_pools()
+    
+    assert len(service.sent) == 6
+    assert len(workers) <= 2
@@ -0,0 +1,40 @@
+from pathlib import Path
+import pytest
+from prompt_compactor import PromptCompactor
+
+CORPUS = Path(__file__).parent / 'fixtures' / 'prompt_compactor'
+CASES = sorted(path.name[:-len('.input.txt')] for path in CORPUS.glob('*.input.txt'))
+
+def read(name: str, kind: str) -> str:
+    return (CORPUS / f"{name}.{kind}.txt").read_text(encoding='utf-8')
+
+@pytest.mark.parametrize('name', CASES)
+def test_corpus(name):
+    result = PromptCompactor(max_tokens=2000).compact(read(name, 'input'))
+    assert result['text'] == read(name, 'expected').rstrip('\n')
+
+def test_corpus_covers_quotes_signatures_and_disclaimers():
+    prefixes = {name.split('_')[0] for name in CASES}
+    assert {'quoted', 'signature', 'disclaimer', 'confidential'} <= prefixes
+
+def test_single_marker_in_last_paragraph_is_kept():
+    body = "Hi,\n\nCan you confirm the order?\n\nThe attached price list is confidential."
+    assert PromptCompactor(max_tokens=2000).compact(body)['text'] == body
+
+def test_footer_above_content_is_kept():
+    body = "Confidential and privileged notice for the intended recipient.\n\nPlease call me back."
+    assert PromptCompactor(max_tokens=2000).compact(body)['text'] == body
+
+def test_token_savings_are_reported():
+    result = PromptCompactor(max_tokens=2000).compact(read('quoted_chain_en', 'input'))
+    assert result['tokens'] < result['original_tokens']
+    assert result['tokens_saved'] == result['original_tokens'] - result['tokens']
+
+def test_truncate_keeps_beginning_and_end():
+    body = 'Request line\n' + 'filler text\n' * 500 + 'Question at the end?'
+    text = PromptCompactor(max_tokens=100).compact(body)['text']
+    
+    assert text.startswith('Request line')
+    assert text.endswith('Question at the end?')
+    assert '[...]' in text
+    assert PromptCompactor.estimate_tokens(text) <= 110
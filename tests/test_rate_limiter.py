@@ -0,0 +1,151 @@
+import json
+from email.utils import formatdate
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+from rate_limiter import RateLimiter
+
+class FakeClock:
+    # Time only moves when the limiter sleeps, so pacing is exact and tests don't wait
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+    
+    def __call__(self) -> float:
+        return self.now
+    
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class ThrottlingApi:
+    """Fake API call that fails with the scripted errors before succeeding"""
+    
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+    
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+def http_error(status: int, reason: str = 'backendError', **headers) -> HttpError:
+    body = {'error': {'code': status, 'message': reason, 'errors': [{'domain': 'usageLimits', 'reason': reason}]}}
+    return HttpError(httplib2.Response({'status': status, **headers}), json.dumps(body).encode(), uri='https://gmail.googleapis.com/')
+
+def make_limiter(clock: FakeClock, rate: float = 10, burst: int = 1, max_attempts: int = 3) -> RateLimiter:
+    return RateLimiter('test', rate, burst=burst, max_attempts=max_attempts, base_delay=1.0,
+                       clock=clock, sleep=clock.sleep, jitter=lambda: 1.0)
+
+def test_token_bucket_paces_calls():
+    clock = FakeClock()
+    limiter = make_limiter(clock, rate=10, burst=2)
+    
+    for _ in range(6):
+        limiter.acquire()
+    
+    # Two calls use the burst, the remaining four wait a tenth of a second each
+    assert clock.now == pytest.approx(0.4)
+    assert all(wait == pytest.approx(0.1) for wait in clock.sleeps)
+
+def test_large_cost_drains_full_bucket():
+    clock = FakeClock()
+    limiter = make_limiter(clock, rate=10, burst=5)
+    
+    limiter.acquire(cost=50)
+    assert clock.now == 0.0
+    limiter.acquire()
+    assert clock.now == pytest.approx(0.1)
+
+def test_retry_after_seconds():
+    clock = FakeClock()
+    limiter = make_limiter(clock, rate=100)
+    api = ThrottlingApi(http_error(429, 'rateLimitExceeded', **{'retry-after': '7'}))
+    
+    assert limiter.call(api) == 'ok'
+    assert api.calls == 2
+    assert 7.0 in clock.sleeps
+
+def test_retry_after_http_date(monkeypatch):
+    clock = FakeClock()
+    limiter = make_limiter(clock, rate=100)
+    now = 1_800_000_000.0
+    monkeypatch.setattr('rate_limiter.time.time', lambda: now)
+    error = http_error(503, **{'retry-after': formatdate(now + 30, usegmt=True)})
+    
+    assert RateLimiter.get_retry_after(error) == pytest.approx(30.0)
+    assert limiter.call(ThrottlingApi(error)) == 'ok'
+    assert clock.sleeps[-1] == pytest.approx(30.0)
+
+def test_user_rate_limit_403_counts_as_throttling():
+    assert RateLimiter.get_status(http_error(403, 'userRateLimitExceeded')) == 429
+    assert RateLimiter.get_status(http_error(403, 'insufficientPermissions')) == 403
+
+def test_403_rate_limit_is_retried_and_other_403_is_not():
+    clock = FakeClock()
+    limiter = make_limiter(clock, rate=100)
+    
+    assert limiter.call(ThrottlingApi(http_error(403, 'rateLimitExceeded'))) == 'ok'
+    with pytest.raises(HttpError):
+        limiter.call(ThrottlingApi(http_error(403, 'insufficientPermissions')))
+
+def test_throttling_halves_rate_and_success_recovers_it():
+    clock = FakeClock()
+    limiter = make_limiter(clock, rate=16, max_attempts=5)
+    
+    limiter.call(ThrottlingApi(http_error(429, 'rateLimitExceeded'), http_error(429, 'rateLimitExceeded')))
+    # Two 429s halve the rate twice, the final success adds back a twentieth
+    assert limiter.rate == pytest.approx(4 + 16 / 20)
+    assert limiter.throttled == 2
+    
+    for _ in range(30):
+        limiter.call(ThrottlingApi())
+    assert limiter.rate == pytest.approx(16)
+
+def test_rate_never_drops_below_minimum():
+    clock = FakeClock()
+    limiter = make_limiter(clock, rate=16, max_attempts=20)
+    
+    limiter.call(ThrottlingApi(*[http_error(429, 'rateLimitExceeded') for _ in range(10)]))
+    assert limiter.rate >= 1.0
+
+def test_gives_up_after_max_attempts():
+    clock = FakeClock()
+    limiter = make_limiter(clock, rate=100, max_attempts=3)
+    api = ThrottlingApi(*[http_error(503) for _ in range(5)])
+    
+    with pytest.raises(HttpError):
+        limiter.call(api)
+    assert api.calls == 3
+    assert limiter.retries == 2
+
+def test_backoff_grows_exponentially_up_to_max_delay():
+    limiter = RateLimiter('test', 10, base_delay=1.0, max_delay=5.0, jitter=lambda: 1.0)
+    assert [limiter.backoff(attempt) for attempt in range(1, 5)] == [1.0, 2.0, 4.0, 5.0]
+
+def test_non_idempotent_calls_only_retry_throttling():
+    clock = FakeClock()
+    limiter = make_limiter(clock, rate=100)
+    api = ThrottlingApi(http_error(502))
+    
+    with pytest.raises(HttpError):
+        limiter.call(api, retryable=RateLimiter.THROTTLED_STATUSES)
+    assert api.calls == 1
+    
+    api = ThrottlingApi(http_error(429, 'rateLimitExceeded'))
+    assert limiter.call(api, retryable=RateLimiter.THROTTLED_STATUSES) == 'ok'
+    assert api.calls == 2
+
+def test_gmail_send_is_not_retried_on_server_error():
+    from fakes import FakeGmailService
+    from gmail_client import GmailClient
+    
+    service = FakeGmailService(error_rate=1.0, error_status=502)
+    client = GmailClient(service.email_address, service=service)
+    client.rate_limiter = make_limiter(FakeClock(), rate=100)
+    
+    assert not client.send_email('customer@example.com', 'Teklif', 'Merhaba')
+    assert service.calls['messages.send'] == 1
+    assert not service.sent
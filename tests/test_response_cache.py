@@ -0,0 +1,32 @@
+import time
+from response_cache import ResponseCache
+
+def stored_bytes(cache: ResponseCache) -> int:
+    return cache.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+def test_running_size_matches_table(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.db'), ttl=3600, max_bytes=1000)
+    for index in range(50):
+        cache.set('response', f"prompt {index}", 'x' * 90)
+    cache.set('response', 'prompt 49', 'y' * 10)
+    
+    assert cache.get_stats()['bytes'] == stored_bytes(cache) <= 1000
+    # The most recently used entries are kept
+    assert cache.get('response', 'prompt 49') == 'y' * 10
+    assert cache.get('response', 'prompt 0') is None
+    cache.close()
+    
+    reopened = ResponseCache(str(tmp_path / 'cache.db'), ttl=3600, max_bytes=1000)
+    assert reopened.get_stats()['bytes'] == stored_bytes(reopened)
+
+def test_expired_entries_are_evicted_first(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / 'cache.db'), ttl=60, max_bytes=200)
+    cache.set('response', 'old', 'o' * 100)
+    cache.set('response', 'recent', 'r' * 50)
+    
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 120)
+    cache.set('response', 'new', 'n' * 100)
+    
+    assert cache.get_stats()['bytes'] == stored_bytes(cache) == 100
+    assert cache.get('response', 'new') == 'n' * 100
@@ -0,0 +1,90 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import List, Dict
+from config import Config
+
+class ThreadContextStore:
+    # Each earlier message is kept as a short excerpt
+    ENTRY_CHARS = 400
+    
+    def __init__(self, path: str = None, max_tokens: int = None):
+        self.logger = logging.getLogger(__name__)
+        self.path = path or Config.THREAD_CONTEXT_FILE
+        self.max_chars = (max_tokens or Config.THREAD_CONTEXT_TOKENS) * 4
+        self._lock = threading.Lock()
+        self._connect()
+    
+    def _connect(self):
+        """Open the thread context database and create the schema"""
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS threads (
+                thread_id TEXT PRIMARY KEY,
+                entries TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+    
+    def _load(self, thread_id: str) -> List[Dict]:
+        """Load the stored entries of a thread; callers hold the lock"""
+        row = self.conn.execute('SELECT entries FROM threads WHERE thread_id = ?', (thread_id,)).fetchone()
+        return json.loads(row[0]) if row else []
+    
+    def _save(self, thread_id: str, entries: List[Dict]):
+        """Store thread entries in time order, dropping the oldest ones beyond the size budget"""
+        # Messages can be recorded out of order, e.g. a requeued email after newer ones
+        entries.sort(key=lambda entry: entry.get('sent_at') or 0)
+        while len(entries) > 1 and sum(len(entry['text']) for entry in entries) > self.max_chars:
+            entries.pop(0)
+        
+        self.conn.execute(
+            'INSERT OR REPLACE INTO threads (thread_id, entries, updated_at) VALUES (?, ?, ?)',
+            (thread_id, json.dumps(entries, ensure_ascii=False), time.time())
+        )
+        self.conn.commit()
+    
+    def _excerpt(self, text: str) -> str:
+        """Shorten a message to a single-line excerpt"""
+        text = ' '.join(text.split())
+        if len(text) > self.ENTRY_CHARS:
+            text = text[:self.ENTRY_CHARS].rsplit(' ', 1)[0] + ' ...'
+        return text
+    
+    def get_summary(self, thread_id: str, exclude_message_id: str = None, before: float = None) -> str:
+        """Return the rolling summary of the messages in a thread that came before a point in time"""
+        with self._lock:
+            entries = self._load(thread_id)
+        
+        return '\n'.join(
+            f"- {entry['author']}: {entry['text']}" for entry in entries
+            if (exclude_message_id is None or entry.get('message_id') != exclude_message_id)
+            and (before is None or entry.get('sent_at') is None or entry['sent_at'] < before)
+        )
+    
+    def add_message(self, thread_id: str, message_id: str, sender: str, text: str, sent_at: float = None):
+        """Add an incoming message to the thread summary, once per message ID"""
+        with self._lock:
+            entries = self._load(thread_id)
+            if any(entry.get('message_id') == message_id for entry in entries):
+                return
+            
+            entries.append({'message_id': message_id, 'author': sender, 'text': self._excerpt(text), 'sent_at': sent_at})
+            self._save(thread_id, entries)
+    
+    def add_reply(self, thread_id: str, text: str):
+        """Add an approved reply to the thread summary"""
+        with self._lock:
+            entries = self._load(thread_id)
+            entries.append({'author': 'Biz', 'text': self._excerpt(text), 'sent_at': time.time()})
+            self._save(thread_id, entries)
+    
+    def close(self):
+        """Close the thread context database"""
+        with self._lock:
+            self.conn.close()